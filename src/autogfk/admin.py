@@ -1,38 +1,77 @@
 from __future__ import annotations
+from django.utils.functional import cached_property
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db.models import Q
+from .contenttypes import _apply_limit_choices, _is_dynamic, allowed_content_types, get_limit_choices_to
 from .forms import AutoGenericForeignKeyFormField
+from .registry import get_gfk_specs
 from .widgets import AutoGenericForeignKeyWidget
 
 SURROGATE_SUFFIX = "__autogfk"
+# Max form classes kept per ModelAdmin by get_form()
+FORM_CLASS_CACHE_SIZE = 128
 
 
-def _apply_limit_choices(qs, lct):
+def _surrogate_structure(model, specs):
     """
-    Accepts dict, Q or callable returning dict/Q.
-    Also accepts lists/tuples of Q/dicts (does AND).
+    Per-GFK data shared by every form of `model`: surrogate name, physical
+    fields, label, pair-required flag, oid converter and allowed CT queryset
+    (re-applied to each form by _limit_surrogates() when limit_choices_to is callable).
     """
-    if lct is None:
-        return qs
-    if callable(lct):
-        lct = lct()
-    if isinstance(lct, Q):
-        return qs.filter(lct)
-    if isinstance(lct, dict):
-        return qs.filter(**lct)
-    if isinstance(lct, (list, tuple)):
-        cond = Q()
-        for item in lct:
-            if callable(item):
-                item = item()
-            if isinstance(item, Q):
-                cond &= item
-            elif isinstance(item, dict):
-                cond &= Q(**item)
-        return qs.filter(cond) if cond else qs
-    # fallback: don't apply if it's an unexpected type
-    return qs
+    structure = []
+    for logical, meta in specs.items():
+        lct = get_limit_choices_to(model, logical)
+        ct_model_field = model._meta.get_field(meta["ct_field"])
+        oid_model_field = model._meta.get_field(meta["oid_field"])
+        # rule: the pair is "required" if ANY of the physical fields doesn't accept empty (null=False and blank=False)
+        pair_required = (not getattr(ct_model_field, "null", True) and not getattr(ct_model_field, "blank", True)) \
+                        or (not getattr(oid_model_field, "null", True) and not getattr(oid_model_field, "blank", True))
+        structure.append({
+            "logical": logical,
+            "surrogate": f"{logical}{SURROGATE_SUFFIX}",
+            "ct_field": meta["ct_field"],
+            "ct_attname": ct_model_field.attname,
+            "oid_field": meta["oid_field"],
+            "label": meta.get("label"),
+            "required": pair_required,
+            "oid_to_python": oid_model_field.to_python,
+            "ct_qs": allowed_content_types(model, logical),
+            "dynamic_lct": lct if _is_dynamic(lct) else None,
+        })
+    return structure
+
+
+def _limit_surrogates(form, structure):
+    """
+    Evaluates a callable limit_choices_to for this form instance: the field
+    and widget of the (shared) form class only hold its value at build time.
+    """
+    for m in structure:
+        if m["dynamic_lct"] is not None and m["surrogate"] in form.fields:
+            field = form.fields[m["surrogate"]]
+            ct_qs = _apply_limit_choices(ContentType.objects.all(), m["dynamic_lct"])
+            field.fields[0].queryset = ct_qs
+            field.widget.limit_ct_qs = ct_qs
+
+
+def _defer_surrogates(forms, surrogates, request=None):
+    """
+    Queues the selected objects of every surrogate field of `forms`, resolved
+    on the first render: one query per content type instead of one per widget,
+    and none when nothing renders. With `request`, binds it to the widgets of
+    these form instances first (widgets of cached form classes have none).
+    """
+    widget, values = None, []
+    for form in forms:
+        for surrogate in surrogates:
+            if surrogate in form.fields:
+                widget = form.fields[surrogate].widget
+                if request is not None:
+                    widget.request = request
+                values.append(form[surrogate].value())
+    if widget is not None:
+        # surrogate widgets share the memo of the request
+        widget.defer_prime(values)
+
 
 class AutoGenericForeignKeyAdminMixin:
     # Controls whether the CT select shows 'app_label | verbose_name' or only the model label
@@ -41,30 +80,22 @@ class AutoGenericForeignKeyAdminMixin:
     # Controls whether the widget is enabled for plain GenericForeignKey fields as well
     enable_widget_for_genericforeignkey = True
 
+    # Lets the object select search every allowed content type while none is picked
+    enable_search_all_content_types = False
+
+    # Reuses the form class built by get_form() (see _autogfk_form_cache_key); turn off
+    # when the form depends on the request beyond the user and their permissions
+    enable_form_class_cache = True
+
     def _discover_plain_gfk_specs(self):
         """
         Discover GenericForeignKeys PUROS no model (sem ser AutoGenericForeignKey),
         and returns a dict compatible with _autogfk_fields.
         """
-        specs = {}
         model = getattr(self, "model", None)
         if not model:
-            return specs
-        for f in getattr(model._meta, "private_fields", []):
-            # Em Django, GenericForeignKey é 'private_field'
-            if isinstance(f, GenericForeignKey):
-                name = f.name
-                ct_field = f.ct_field
-                oid_field = f.fk_field
-                label = getattr(f, "verbose_name", None) or name.replace("_", " ").title()
-                specs[name] = {
-                    "ct_field": ct_field,
-                    "oid_field": oid_field,
-                    "limit_choices_to": None,   # will be read from the CT FK later
-                    "label": label,
-                    "_source": "plain_gfk",
-                }
-        return specs
+            return {}
+        return {k: v for k, v in get_gfk_specs(model).items() if v["_source"] == "plain_gfk"}
 
 
     def _surrogate(self, logical_name: str) -> str:
@@ -72,12 +103,12 @@ class AutoGenericForeignKeyAdminMixin:
 
     def _specs(self):
         model = getattr(self, "model", None)
-        base = dict(getattr(model, "_autogfk_fields", {}) if model else {})
-        if model and getattr(self, "enable_plain_genericforeignkey", True):
-            # merge plain GenericForeignKeys without overwriting AutoGenericForeignKeys
-            for k, v in self._discover_plain_gfk_specs().items():
-                base.setdefault(k, v)
-        return base
+        if not model:
+            return {}
+        specs = get_gfk_specs(model)
+        if getattr(self, "enable_plain_genericforeignkey", True):
+            return dict(specs)
+        return {k: v for k, v in specs.items() if v["_source"] != "plain_gfk"}
 
     def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
         try:
@@ -87,6 +118,44 @@ class AutoGenericForeignKeyAdminMixin:
             if hasattr(self, "_autogfk_rendering"):
                 delattr(self, "_autogfk_rendering")
 
+    def _autogfk_structure(self):
+        # per-GFK structure of the model; doesn't depend on the request
+        structure = self.__dict__.get("_autogfk_structure_cache")
+        if structure is None:
+            structure = self._autogfk_structure_cache = _surrogate_structure(self.model, self._specs())
+        return structure
+
+    def _autogfk_form_cache_key(self, request, obj, kwargs):
+        """
+        What the form class built by get_form() depends on: the add/change
+        mode, the form fields, readonly fields, exclude, the change permission
+        (Django's get_form() turns every field readonly without it), the
+        other get_form() kwargs and the user with their permissions: the
+        related-field wrappers (can_add_related, ...) and formfield_for_*
+        hooks are built for the request's user.
+        """
+        user = getattr(request, "user", None)
+        if user is None:
+            return None
+        if user.is_superuser:
+            user_sig = (user.pk, True)
+        else:
+            user_sig = (user.pk, False, frozenset(user.get_all_permissions()))
+        try:
+            key = (
+                obj is None,
+                kwargs["fields"],
+                tuple(self.get_readonly_fields(request, obj)),
+                tuple(self.get_exclude(request, obj) or ()),
+                obj is not None and self.has_change_permission(request, obj),
+                tuple(sorted((k, repr(v)) for k, v in kwargs.items() if k != "fields")),
+                user_sig,
+            )
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
     def get_form(self, request, obj=None, **kwargs):
         specs = self._specs()
         model = self.model
@@ -110,16 +179,22 @@ class AutoGenericForeignKeyAdminMixin:
         self._autogfk_form_fields = set(desired)
         self._autogfk_user_declared_fields = user_declared_fields
 
-        base_form = super().get_form(request, obj, **kwargs)
-
         if not specs:
-            return base_form
+            return super().get_form(request, obj, **kwargs)
+
+        cache_key = self._autogfk_form_cache_key(request, obj, kwargs) if self.enable_form_class_cache else None
+        form_cache = self.__dict__.setdefault("_autogfk_form_cache", {})
+        if cache_key is not None and cache_key in form_cache:
+            return form_cache[cache_key]
+
+        base_form = super().get_form(request, obj, **kwargs)
+        structure = self._autogfk_structure()
 
         # 2) Create ONE unique subclass and inject ALL surrogates
         #    Also consolidate Meta.exclude to hide all ct/oid.
         all_exclude = list(getattr(getattr(base_form, "Meta", object), "exclude", []) or [])
-        for meta in specs.values():
-            for f in (meta["ct_field"], meta["oid_field"]):
+        for m in structure:
+            for f in (m["ct_field"], m["oid_field"]):
                 if f not in all_exclude:
                     all_exclude.append(f)
 
@@ -127,60 +202,60 @@ class AutoGenericForeignKeyAdminMixin:
             class Meta(base_form.Meta if hasattr(base_form, "Meta") else object):
                 exclude = all_exclude
 
-        # Add all surrogate fields
-        for logical, meta in specs.items():
-            ct_field = meta["ct_field"]
-            oid_field = meta["oid_field"]
-            ct_model_field = self.model._meta.get_field(ct_field)
-            oid_model_field = self.model._meta.get_field(oid_field)
-            label = meta.get("label")
-            surrogate = self._surrogate(logical)
+            def __init__(self2, *args, **kw):
+                super().__init__(*args, **kw)
+                _limit_surrogates(self2, structure)
+                # initial comes from the instance, so the class can be shared across objects
+                inst = self2.instance
+                if inst is not None and not inst._state.adding:
+                    for m in structure:
+                        self2.initial.setdefault(
+                            m["surrogate"], (getattr(inst, m["ct_attname"], None), getattr(inst, m["oid_field"], None))
+                        )
 
+        # Add all surrogate fields
+        for m in structure:
             # ContentType queryset respecting limit_choices_to:
             # 1) If the AutoGenericForeignKey auto-created the FK, we use meta["limit_choices_to"];
             # 2) If the user declared a custom FK, we read limit_choices_to directly from the FK.
-            ct_qs = ContentType.objects.all()
-            lct = meta.get("limit_choices_to")
-            if not lct:
-                try:
-                    fk_field = self.model._meta.get_field(ct_field)
-                    lct = getattr(getattr(fk_field, "remote_field", fk_field), "limit_choices_to", None)
-                except Exception:
-                    lct = None
-            ct_qs = _apply_limit_choices(ct_qs, lct)
-
-            # rule: the pair is "required" if ANY of the physical fields doesn't accept empty (null=False and blank=False)
-            pair_required = (not getattr(ct_model_field, "null", True) and not getattr(ct_model_field, "blank", True)) \
-                            or (not getattr(oid_model_field, "null", True) and not getattr(oid_model_field, "blank", True))
-
-
-            f = AutoGenericForeignKeyFormField(label=label, required=pair_required, limit_ct_qs=ct_qs)
+            f = AutoGenericForeignKeyFormField(
+                label=m["label"], required=m["required"], limit_ct_qs=m["ct_qs"], oid_to_python=m["oid_to_python"],
+            )
+            # no request here: render_change_form() binds it to each form instance
             f.widget = AutoGenericForeignKeyWidget(
                 self,
                 self.admin_site,
-                request=request,
-                limit_ct_qs=ct_qs,
+                limit_ct_qs=m["ct_qs"],
                 show_app_label=self.show_app_label_on_ct_field,
+                search_all_content_types=self.enable_search_all_content_types,
             )
-            if obj is not None:
-                ct_val = getattr(obj, ct_field + "_id", None)
-                oid_val = getattr(obj, oid_field, None)
-                f.initial = (ct_val, oid_val)
-            UnifiedForm.base_fields[surrogate] = f
+            UnifiedForm.base_fields[m["surrogate"]] = f
 
         # Wrap the save: iterate over all surrogates and propagate ct/oid
         orig_save = UnifiedForm.save
         def _save(self2, commit=True):
-            for logical, meta in specs.items():
-                surrogate = f"{logical}{SURROGATE_SUFFIX}"
-                cleaned = self2.cleaned_data.get(surrogate) or {}
-                setattr(self2.instance, meta["ct_field"], cleaned.get("content_type"))
-                setattr(self2.instance, meta["oid_field"], cleaned.get("object_id"))
+            for m in structure:
+                cleaned = self2.cleaned_data.get(m["surrogate"]) or {}
+                setattr(self2.instance, m["ct_field"], cleaned.get("content_type"))
+                setattr(self2.instance, m["oid_field"], cleaned.get("object_id"))
             return orig_save(self2, commit)
         UnifiedForm.save = _save
 
+        if cache_key is not None:
+            if len(form_cache) >= FORM_CLASS_CACHE_SIZE:
+                form_cache.pop(next(iter(form_cache)))
+            form_cache[cache_key] = UnifiedForm
         return UnifiedForm
 
+    def render_change_form(self, request, context, *args, **kwargs):
+        # only pages that render get here (not a POST that saves and redirects)
+        adminform = context.get("adminform")
+        if adminform is not None:
+            _defer_surrogates(
+                [adminform.form], [m["surrogate"] for m in self._autogfk_structure()], request=request,
+            )
+        return super().render_change_form(request, context, *args, **kwargs)
+
     def get_fieldsets(self, request, obj=None):
         fieldsets = list(super().get_fieldsets(request, obj))
         specs = self._specs()
@@ -256,29 +331,28 @@ class AutoGenericForeignKeyInlineAdminMixin:
     show_app_label_on_ct_field = True
     # Enable wrapping native GenericForeignKey (in addition to AutoGenericForeignKey)
     enable_plain_genericforeignkey = True
+    # Lets the object select search every allowed content type while none is picked
+    enable_search_all_content_types = False
 
     def _surrogate(self, logical: str) -> str:
         return f"{logical}{SURROGATE_SUFFIX}"
 
     def _discover_plain_gfk_specs(self, model):
-        specs = {}
-        for f in getattr(model._meta, "private_fields", []):
-            if isinstance(f, GenericForeignKey):
-                specs[f.name] = {
-                    "ct_field": f.ct_field,
-                    "oid_field": f.fk_field,
-                    "limit_choices_to": None,  # read from the FK at runtime
-                    "label": getattr(f, "verbose_name", None) or f.name.replace("_", " ").title(),
-                    "_source": "plain_gfk",
-                }
-        return specs
+        return {k: v for k, v in get_gfk_specs(model).items() if v["_source"] == "plain_gfk"}
 
     def _specs(self, model):
-        base = dict(getattr(model, "_autogfk_fields", {}) or {})
+        specs = get_gfk_specs(model)
         if self.enable_plain_genericforeignkey:
-            for k, v in self._discover_plain_gfk_specs(model).items():
-                base.setdefault(k, v)
-        return base
+            return dict(specs)
+        return {k: v for k, v in specs.items() if v["_source"] != "plain_gfk"}
+
+    def _autogfk_structure(self, model, specs):
+        # per-GFK structure of the inline model, shared by every get_formset() call
+        cache = self.__dict__.setdefault("_autogfk_structure_cache", {})
+        key = (model, tuple(specs))
+        if key not in cache:
+            cache[key] = _surrogate_structure(model, specs)
+        return cache[key]
 
     # --- InlineModelAdmin hooks ---
 
@@ -336,53 +410,43 @@ class AutoGenericForeignKeyInlineAdminMixin:
                     all_exclude.append(f)
 
         # Rebuild a unified ModelForm
+        # Field metadata (required flags, limit sets, converters) is computed once
+        # and shared by every form of the formset
+        structure = self._autogfk_structure(model, specs)
+
         class UnifiedForm(base_form):
             class Meta(base_form.Meta if hasattr(base_form, "Meta") else object):
                 exclude = tuple(all_exclude)
 
+            def __init__(self2, *args, **kw):
+                super().__init__(*args, **kw)
+                # also reached by empty_form, which skips _construct_form()
+                _limit_surrogates(self2, structure)
+
         # Inject surrogates: field by field
-        for logical, meta in specs.items():
-            ct_field = meta["ct_field"]
-            oid_field = meta["oid_field"]
-            label = meta.get("label")
-            surrogate = self._surrogate(logical)
-
-            # limit_choices_to: use the AutoGenericForeignKey limit_choices_to (if any) or read from the real FK
-            lct = meta.get("limit_choices_to")
-            if not lct:
-                try:
-                    fk_field = model._meta.get_field(ct_field)
-                    lct = getattr(getattr(fk_field, "remote_field", fk_field), "limit_choices_to", None)
-                except Exception:
-                    lct = None
-            ct_qs = _apply_limit_choices(ContentType.objects.all(), lct)
-
-            # required = based on the physical fields
-            ct_model_field = model._meta.get_field(ct_field)
-            oid_model_field = model._meta.get_field(oid_field)
-            pair_required = (not getattr(ct_model_field, "null", True) and not getattr(ct_model_field, "blank", True)) \
-                            or (not getattr(oid_model_field, "null", True) and not getattr(oid_model_field, "blank", True))
-
-            f = AutoGenericForeignKeyFormField(label=label, required=pair_required, limit_ct_qs=ct_qs)
+        for m in structure:
+            f = AutoGenericForeignKeyFormField(
+                label=m["label"], required=m["required"], limit_ct_qs=m["ct_qs"], oid_to_python=m["oid_to_python"],
+            )
             f.widget = AutoGenericForeignKeyWidget(
                 self,
                 self.admin_site,
                 request=request,
-                limit_ct_qs=ct_qs,
+                limit_ct_qs=m["ct_qs"],
                 show_app_label=self.show_app_label_on_ct_field,
+                search_all_content_types=self.enable_search_all_content_types,
             )
 
             # initial is resolved by form.instance in editing; here we only register the field
-            UnifiedForm.base_fields[surrogate] = f
+            UnifiedForm.base_fields[m["surrogate"]] = f
 
         # Save: propagate surrogate -> physical fields
         orig_save = UnifiedForm.save
         def _save(self2, commit=True):
-            for logical, meta in specs.items():
-                surrogate = f"{logical}{SURROGATE_SUFFIX}"
-                data = self2.cleaned_data.get(surrogate) or {}
-                setattr(self2.instance, meta["ct_field"], data.get("content_type"))
-                setattr(self2.instance, meta["oid_field"], data.get("object_id"))
+            for m in structure:
+                data = self2.cleaned_data.get(m["surrogate"]) or {}
+                setattr(self2.instance, m["ct_field"], data.get("content_type"))
+                setattr(self2.instance, m["oid_field"], data.get("object_id"))
             return orig_save(self2, commit)
         UnifiedForm.save = _save
 
@@ -394,42 +458,43 @@ class AutoGenericForeignKeyInlineAdminMixin:
             else:
                 cleaned_all = super(UnifiedForm, self2).clean()
 
-            for logical, meta in specs.items():
-                surrogate = f"{logical}{SURROGATE_SUFFIX}"
+            for m in structure:
+                surrogate = m["surrogate"]
                 data = self2.cleaned_data.get(surrogate) or {}
                 ct_val = data.get("content_type")
                 oid_val = data.get("object_id")
 
-                ct_field_name = meta["ct_field"]
-                oid_field_name = meta["oid_field"]
-                ct_model_field = self2._meta.model._meta.get_field(ct_field_name)
-                oid_model_field = self2._meta.model._meta.get_field(oid_field_name)
-                pair_required = (not getattr(ct_model_field, "null", True) and not getattr(ct_model_field, "blank", True)) \
-                                or (not getattr(oid_model_field, "null", True) and not getattr(oid_model_field, "blank", True))
-
                 if (ct_val and not oid_val) or (oid_val and not ct_val):
                     self2.add_error(surrogate, "Select content and object; it is not allowed to fill only one of the two.")
-                elif pair_required and (not ct_val and not oid_val):
+                elif m["required"] and (not ct_val and not oid_val):
                     self2.add_error(surrogate, "This field is required.")
 
             return cleaned_all
         UnifiedForm.clean = _clean
 
         # Finally, wrap the FormSet to change the form class
+        surrogates = [m["surrogate"] for m in structure]
+
         class WrappedFormSet(FormSet):
             form = UnifiedForm
 
+            @cached_property
+            def forms(self):
+                forms = super().forms
+                # labels of all rows at once (one query per content type), on the first render
+                _defer_surrogates(forms, surrogates)
+                return forms
+
             def _construct_form(self, i, **k):
                 form = super()._construct_form(i, **k)
                 # Populate initial when editing existing lines:
                 inst = form.instance
                 if inst and inst.pk:
-                    for logical, meta in specs.items():
-                        surrogate = f"{logical}{SURROGATE_SUFFIX}"
-                        ct_val = getattr(inst, meta["ct_field"] + "_id", None)
-                        oid_val = getattr(inst, meta["oid_field"], None)
-                        if surrogate in form.fields:
-                            form.initial[surrogate] = (ct_val, oid_val)
+                    for m in structure:
+                        if m["surrogate"] in form.fields:
+                            form.initial[m["surrogate"]] = (
+                                getattr(inst, m["ct_attname"], None), getattr(inst, m["oid_field"], None),
+                            )
                 return form
 
         return WrappedFormSet
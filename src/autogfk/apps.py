@@ -3,3 +3,10 @@ from django.apps import AppConfig
 class AutoGenericForeignKeyConfig(AppConfig):
     name = "autogfk"
     verbose_name = "Auto Generic ForeignKey"
+
+    def ready(self):
+        # connects the post_save/post_delete receivers that invalidate the autocomplete cache
+        from . import views  # noqa: F401
+        from .contenttypes import connect_warm_up
+        # loads the ContentType cache on the first request
+        connect_warm_up()
@@ -0,0 +1,227 @@
+# src/autogfk/autocomplete.py
+from __future__ import annotations
+from string import Formatter
+from typing import Any, Callable, Optional, Sequence, Union
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
+# Used when neither register() nor a ModelAdmin provides search fields
+FALLBACK_SEARCH_FIELDS = ("name", "title", "username", "email", "slug", "id")
+
+# model -> options given to register()
+_registry: dict[type[models.Model], dict[str, Any]] = {}
+
+
+def register(
+    model: type[models.Model],
+    *,
+    search_fields: Optional[Sequence[str]] = None,
+    queryset: Optional[Callable[[Any], models.QuerySet]] = None,
+    label_fields: Optional[Sequence[str]] = None,
+    label: Union[str, Callable[[Any], str], None] = None,
+    select_related: Optional[Sequence[str]] = None,
+    preload_threshold: Optional[int] = None,
+) -> None:
+    """
+    Configures how the autocomplete view searches and labels `model`.
+
+    - search_fields: like ModelAdmin.search_fields; "^name" -> istartswith,
+      "=code" -> iexact, "@body" -> search, "name" -> icontains. Prefer prefix
+      and exact lookups so the database can use an index.
+    - queryset: callable(request) returning the base queryset (e.g. scoped by user).
+    - label_fields / label: only pk and these columns are queried (values(),
+      related lookups like "owner__name" are joined). `label` is a format
+      template ("{name} ({owner__name})") or a callable(row_dict); without it
+      the non-empty values are joined with spaces. A template alone implies its
+      fields. A callable without label_fields receives the model instance.
+    - select_related: applied when labels come from instances (str(obj) or a
+      callable without label_fields), to avoid N+1 queries in __str__.
+    - preload_threshold: overrides AUTOGFK_PRELOAD_THRESHOLD for this model.
+    """
+    if isinstance(label, str) and label_fields is None:
+        label_fields = [name for _, name, _, _ in Formatter().parse(label) if name]
+    _registry[model] = {
+        "search_fields": tuple(search_fields or ()),
+        "queryset": queryset,
+        "label_fields": tuple(dict.fromkeys(label_fields)) if label_fields is not None else None,
+        "label": label,
+        "select_related": tuple(select_related or ()),
+        "preload_threshold": preload_threshold,
+    }
+
+
+def unregister(model: type[models.Model]) -> None:
+    _registry.pop(model, None)
+
+
+def get_config(model: type[models.Model]) -> dict[str, Any]:
+    return _registry.get(model, {})
+
+
+def _model_admin(model, admin_site=None):
+    return getattr(admin_site or admin.site, "_registry", {}).get(model)
+
+
+def _construct_search(field_name: str) -> str:
+    # same prefixes as ModelAdmin.get_search_results
+    if field_name.startswith("^"):
+        return f"{field_name[1:]}__istartswith"
+    if field_name.startswith("="):
+        return f"{field_name[1:]}__iexact"
+    if field_name.startswith("@"):
+        return f"{field_name[1:]}__search"
+    if "__" in field_name:
+        return field_name
+    return f"{field_name}__icontains"
+
+
+def _search_fields_q(search_fields: Sequence[str], term: str) -> Q:
+    """
+    AND across the words of `term`, OR across the fields (as the admin does).
+    """
+    cond = Q()
+    for bit in smart_split(term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        or_q = Q()
+        for f in search_fields:
+            or_q |= Q(**{_construct_search(f): bit})
+        cond &= or_q
+    return cond
+
+
+def _fallback_q(model: type[models.Model], term: str) -> Optional[Q]:
+    search_fields = [f for f in FALLBACK_SEARCH_FIELDS if hasattr(model, f)]
+    if not search_fields:
+        return None
+    filt = Q()
+    for f in search_fields:
+        if f == "id":
+            # match the pk with its own type (int, UUID, ...) instead of a text search
+            try:
+                filt |= Q(pk=model._meta.pk.to_python(term))
+            except ValidationError:
+                pass
+        else:
+            filt |= Q(**{f"{f}__icontains": term})
+    return filt
+
+
+def search_queryset(request, model: type[models.Model], term: str, admin_site=None) -> models.QuerySet:
+    """
+    Base queryset + search for `model`, in order of precedence:
+      1) the options given to register() (queryset hook, search_fields);
+      2) the ModelAdmin registered on the admin site (get_queryset, search_fields,
+         get_search_results);
+      3) icontains over FALLBACK_SEARCH_FIELDS.
+    """
+    config = get_config(model)
+    model_admin = _model_admin(model, admin_site)
+
+    if config.get("queryset") is not None:
+        qs = config["queryset"](request)
+    elif model_admin is not None:
+        qs = model_admin.get_queryset(request)
+    else:
+        qs = model._default_manager.all()
+
+    if not term:
+        return qs
+    if config.get("search_fields"):
+        return qs.filter(_search_fields_q(config["search_fields"], term))
+    if model_admin is not None and model_admin.get_search_fields(request):
+        qs, may_have_duplicates = model_admin.get_search_results(request, qs, term)
+        return qs.distinct() if may_have_duplicates else qs
+    filt = _fallback_q(model, term)
+    return qs.filter(filt) if filt is not None else qs
+
+
+def _is_text_column(model: type[models.Model], path: str) -> bool:
+    # "name", "owner__name": a char/text column reached through single-valued relations only
+    opts = model._meta
+    parts = path.split("__")
+    for i, part in enumerate(parts):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return False
+        if i < len(parts) - 1:
+            if not field.is_relation or field.many_to_many or field.one_to_many or field.related_model is None:
+                return False
+            opts = field.related_model._meta
+    return isinstance(field, (models.CharField, models.TextField))
+
+
+def rank_columns(request, model: type[models.Model], admin_site=None) -> tuple[str, ...]:
+    """
+    Text columns to rank search matches on (exact > prefix > contains): the
+    label fields, then the search fields in the precedence of search_queryset().
+    """
+    config = get_config(model)
+    model_admin = _model_admin(model, admin_site)
+    if config.get("search_fields"):
+        search_fields = config["search_fields"]
+    elif model_admin is not None and model_admin.get_search_fields(request):
+        search_fields = model_admin.get_search_fields(request)
+    else:
+        search_fields = [f for f in FALLBACK_SEARCH_FIELDS if hasattr(model, f)]
+    columns = (*(config.get("label_fields") or ()), *(f.lstrip("^=@") for f in search_fields))
+    return tuple(c for c in dict.fromkeys(columns) if _is_text_column(model, c))
+
+
+def label_fields(model: type[models.Model]) -> Optional[tuple[str, ...]]:
+    """
+    Columns needed to label `model` rows, or None when labels need full instances.
+    """
+    return get_config(model).get("label_fields")
+
+
+def render_label(model: type[models.Model], row) -> str:
+    """
+    Label of one autocomplete row: a values() dict when label_fields() is set,
+    otherwise a model instance.
+    """
+    config = get_config(model)
+    label = config.get("label")
+    if isinstance(row, dict):
+        if callable(label):
+            return str(label(row))
+        if isinstance(label, str):
+            return label.format(**{k: ("" if v is None else v) for k, v in row.items()})
+        return " ".join(str(row[f]) for f in config["label_fields"] if row.get(f) not in (None, ""))
+    if callable(label):
+        return str(label(row))
+    return str(row)
+
+
+def label_queryset(model: type[models.Model], qs: models.QuerySet, extra_fields: Sequence[str] = ()) -> models.QuerySet:
+    """
+    Restricts `qs` to what the labels need: values(<pk attname>, *label_fields,
+    *extra_fields) when label_fields are configured, else select_related on the
+    instances.
+    """
+    fields = label_fields(model)
+    if fields is not None:
+        return qs.values(*dict.fromkeys((model._meta.pk.attname, *fields, *extra_fields)))
+    related = get_config(model).get("select_related")
+    return qs.select_related(*related) if related else qs
+
+
+def preload_threshold(model: type[models.Model]) -> int:
+    """
+    Max rows for `model` to be sent whole and filtered in the browser (0: never).
+    """
+    threshold = get_config(model).get("preload_threshold")
+    if threshold is None:
+        threshold = getattr(settings, "AUTOGFK_PRELOAD_THRESHOLD", 0)
+    return threshold or 0
+
+
+def preload_enabled() -> bool:
+    return bool(getattr(settings, "AUTOGFK_PRELOAD_THRESHOLD", 0)) or any(
+        config.get("preload_threshold") for config in _registry.values()
+    )
@@ -0,0 +1,190 @@
+# src/autogfk/contenttypes.py
+from __future__ import annotations
+from typing import Any, Optional
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_started
+from django.db import DatabaseError, models
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from .registry import get_gfk_specs, iter_gfk_specs
+
+
+def _apply_limit_choices(qs, lct):
+    """
+    Accepts dict, Q or callable returning dict/Q.
+    Also accepts lists/tuples of Q/dicts (does AND).
+    """
+    if lct is None:
+        return qs
+    if callable(lct):
+        lct = lct()
+    if isinstance(lct, Q):
+        return qs.filter(lct)
+    if isinstance(lct, dict):
+        return qs.filter(**lct)
+    if isinstance(lct, (list, tuple)):
+        cond = Q()
+        for item in lct:
+            if callable(item):
+                item = item()
+            if isinstance(item, Q):
+                cond &= item
+            elif isinstance(item, dict):
+                cond &= Q(**item)
+        return qs.filter(cond) if cond else qs
+    # fallback: don't apply if it's an unexpected type
+    return qs
+
+
+def get_content_type(value: Any) -> ContentType:
+    """
+    Resolves a ContentType through the manager's cache. Accepts a ContentType,
+    a model class or instance, a label ("app_label.ModelName") or a ct id.
+    """
+    if isinstance(value, ContentType):
+        return value
+    if isinstance(value, models.Model) or (isinstance(value, type) and issubclass(value, models.Model)):
+        return ContentType.objects.get_for_model(value)
+    if isinstance(value, str) and "." in value:
+        return ContentType.objects.get_for_model(apps.get_model(value))
+    return ContentType.objects.get_for_id(value)
+
+
+async def aget_content_type(value: Any) -> ContentType:
+    """
+    get_content_type() for async code; served from the cache once warmed up.
+    """
+    return await sync_to_async(get_content_type)(value)
+
+
+def get_model(value: Any) -> Optional[type[models.Model]]:
+    """
+    Model class of a content type (see get_content_type); None when the
+    ContentType row outlived its model.
+    """
+    return get_content_type(value).model_class()
+
+
+def warm_up(using: Optional[str] = None) -> None:
+    """
+    Loads the ContentType of every installed model (proxies included) into the
+    manager cache with one query, so later get_for_id()/get_for_model() calls
+    in this process don't hit the database.
+    """
+    ContentType.objects.db_manager(using).get_for_models(*apps.get_models(), for_concrete_models=False)
+
+
+def _warm_up_on_first_request(sender, **kwargs):
+    # runs once per process; AppConfig.ready() must not query the database
+    request_started.disconnect(dispatch_uid="autogfk.contenttypes.warm_up")
+    if getattr(settings, "AUTOGFK_WARM_UP_CONTENT_TYPES", True):
+        try:
+            warm_up()
+        except DatabaseError:
+            # e.g. contenttypes not migrated yet; the cache fills lazily instead
+            pass
+
+
+def connect_warm_up() -> None:
+    request_started.connect(_warm_up_on_first_request, dispatch_uid="autogfk.contenttypes.warm_up")
+
+
+def _on_content_type_deleted(sender, **kwargs):
+    # only reaches this process: other processes keep serving the deleted row
+    # from their cache, so readers must handle model_class() being None (and
+    # ContentType.DoesNotExist when the row is looked up for the first time)
+    ContentType.objects.clear_cache()
+    _allowed_ids.clear()
+    _target_models.clear()
+
+
+post_delete.connect(_on_content_type_deleted, sender=ContentType, dispatch_uid="autogfk.contenttypes.post_delete")
+
+
+def _on_content_type_created(sender, created=False, **kwargs):
+    # migrate ran in this process: the limit_choices_to memos below may miss the new row
+    if created:
+        _allowed_ids.clear()
+        _target_models.clear()
+
+
+post_save.connect(_on_content_type_created, sender=ContentType, dispatch_uid="autogfk.contenttypes.post_save")
+
+
+def get_limit_choices_to(model: type[models.Model], name: str):
+    """
+    limit_choices_to of a GFK: the AutoGenericForeignKey option when given,
+    otherwise the one declared on the ContentType FK (plain GFKs, custom fields).
+    """
+    spec = get_gfk_specs(model)[name]
+    lct = spec.get("limit_choices_to")
+    if not lct:
+        try:
+            fk_field = model._meta.get_field(spec["ct_field"])
+            lct = getattr(getattr(fk_field, "remote_field", fk_field), "limit_choices_to", None)
+        except Exception:
+            lct = None
+    return lct
+
+
+def allowed_content_types(model: type[models.Model], name: str):
+    """
+    ContentType queryset allowed for the GFK `name` of `model`.
+    """
+    return _apply_limit_choices(ContentType.objects.all(), get_limit_choices_to(model, name))
+
+
+# (model, gfk name) -> ids allowed by a limit_choices_to that isn't callable
+_allowed_ids: dict[tuple[type[models.Model], str], tuple[int, ...]] = {}
+
+
+def _is_dynamic(lct) -> bool:
+    if isinstance(lct, (list, tuple)):
+        return any(callable(item) for item in lct)
+    return callable(lct)
+
+
+def allowed_content_type_ids(model: type[models.Model], name: str) -> tuple[int, ...]:
+    """
+    Ids of allowed_content_types(model, name). Kept per process unless
+    limit_choices_to is callable: content types only appear with new models,
+    i.e. with a deploy. Resolve them with get_content_type()/get_model().
+    """
+    key = (model, name)
+    ids = _allowed_ids.get(key)
+    if ids is None:
+        ids = tuple(allowed_content_types(model, name).values_list("pk", flat=True))
+        if not _is_dynamic(get_limit_choices_to(model, name)):
+            _allowed_ids[key] = ids
+    return ids
+
+
+# [frozenset of models | None]; empty until gfk_target_models() first runs
+_target_models: list = []
+
+
+def gfk_target_models() -> Optional[frozenset]:
+    """
+    Models the GFKs of the project may point to, or None when some GFK has no
+    static limit_choices_to (it may point to any model). Kept per process,
+    like allowed_content_type_ids().
+    """
+    if not _target_models:
+        targets = set()
+        for model, name, _ in iter_gfk_specs():
+            lct = get_limit_choices_to(model, name)
+            if not lct or _is_dynamic(lct):
+                targets = None
+                break
+            for ct_id in allowed_content_type_ids(model, name):
+                try:
+                    target = get_model(ct_id)
+                except ContentType.DoesNotExist:
+                    continue
+                if target is not None:
+                    targets.add(target)
+        _target_models.append(frozenset(targets) if targets is not None else None)
+    return _target_models[0]
@@ -1,22 +1,45 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Optional, Sequence
+import django
 from django.db import models
+from django.db.backends.utils import names_digest, split_identifier
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
+from . import registry  # noqa: F401  (connects the class_prepared receiver before models are built)
 _SENTINEL = object()
+
+# oid_type shortcuts -> (field class, extra kwargs) for the auto-created <name>_object_id
+OID_FIELD_TYPES = {
+    "positive_integer": (models.PositiveIntegerField, {}),
+    "integer": (models.IntegerField, {}),
+    "big_integer": (models.BigIntegerField, {}),
+    "positive_big_integer": (models.PositiveBigIntegerField, {}),
+    "uuid": (models.UUIDField, {}),
+    "char": (models.CharField, {"max_length": 255}),
+}
 class AutoGenericForeignKey(GenericForeignKey):
     """
     GenericForeignKey with auto-creation of auxiliary fields and metadata for Admin.
     Validation rules:
     - If `ct_field` is provided, `oid_field` must also be provided (and vice-versa).
     - If `ct_field`/`oid_field` are provided (custom fields), it is NOT allowed
-      to pass: `limit_choices_to`, `related_name`, `on_delete`, `null`, `blank`.
+      to pass: `limit_choices_to`, `related_name`, `on_delete`, `null`, `blank`, `oid_type`.
       These parameters must be defined directly on the declared custom fields.
     - If there is NO `ct_field`/`oid_field` (auto mode), the field will create:
         * <name>_content_type = FK(ContentType, on_delete=..., limit_choices_to=...)
         * <name>_object_id   = PositiveIntegerField(null/blank=...)
-      and will propagate the parameters mentioned above.
+      and will propagate the parameters mentioned above. `oid_type` picks another
+      column type for the object id, matching the targets' primary keys: one of
+      OID_FIELD_TYPES ("big_integer", "uuid", "char", ...) or a Field subclass.
+    Composite index:
+    - `pair_index=True` adds an index on (ct, oid) to Meta.indexes (opt-in, so
+      upgrading doesn't add migrations). `pair_index_include` adds covering
+      columns and `pair_index_partial` restricts it to rows WHERE ct IS NOT NULL.
+    Pair consistency:
+    - `pair_constraint=True` adds a CheckConstraint requiring ct and oid to be
+      both NULL or both set. Constrained pairs are no longer patched up in
+      Python by AutoGenericForeignKeyModel.save().
     """
     def __init__(
             self,
@@ -29,6 +52,11 @@ class AutoGenericForeignKey(GenericForeignKey):
         related_name: Optional[str] = None,
         on_delete: Optional[object] = None,
         label: Optional[str] = None,
+        pair_index: bool = False,
+        pair_index_include: Optional[Sequence[str]] = None,
+        pair_index_partial: bool = False,
+        pair_constraint: bool = False,
+        oid_type: object = "positive_integer",
     ) -> None:
         # ct/oid pairing rules
         if (ct_field is None) ^ (oid_field is None):
@@ -51,6 +79,8 @@ class AutoGenericForeignKey(GenericForeignKey):
                 forbidden["null"] = null
             if blank is not False:
                 forbidden["blank"] = blank
+            if oid_type != "positive_integer":
+                forbidden["oid_type"] = oid_type
             if forbidden:
                 raise ImproperlyConfigured(
                     "AutoGenericForeignKey: when using custom ct_field/oid_field, do NOT pass these "
@@ -65,6 +95,19 @@ class AutoGenericForeignKey(GenericForeignKey):
         self.related_name = related_name if self._owns_fields else None
         self.on_delete = on_delete if self._owns_fields else None
         self.label = label
+        self.pair_index = bool(pair_index)
+        if not self.pair_index and (pair_index_include or pair_index_partial):
+            raise ImproperlyConfigured(
+                "AutoGenericForeignKey: pair_index_include/pair_index_partial need pair_index=True."
+            )
+        self.pair_index_include = tuple(pair_index_include or ())
+        self.pair_index_partial = bool(pair_index_partial)
+        self.pair_constraint = bool(pair_constraint)
+        if isinstance(oid_type, str) and oid_type not in OID_FIELD_TYPES:
+            raise ImproperlyConfigured(
+                f"AutoGenericForeignKey: unknown oid_type {oid_type!r}; use one of {list(OID_FIELD_TYPES)} or a Field subclass."
+            )
+        self.oid_type = oid_type
         super().__init__(ct_field or "", oid_field or "")
     def deconstruct(self):
         path = f"{self.__class__.__module__}.{self.__class__.__name__}"
@@ -85,7 +128,64 @@ class AutoGenericForeignKey(GenericForeignKey):
                 kwargs["on_delete"] = self.on_delete
         if self.label:
             kwargs["label"] = self.label
+        if self.pair_index:
+            kwargs["pair_index"] = True
+        if self.pair_index_include:
+            kwargs["pair_index_include"] = list(self.pair_index_include)
+        if self.pair_index_partial:
+            kwargs["pair_index_partial"] = True
+        if self.pair_constraint:
+            kwargs["pair_constraint"] = True
+        if self.oid_type != "positive_integer":
+            kwargs["oid_type"] = self.oid_type
         return (self.name, path, (), kwargs)
+
+    def _contribute_pair_index(self, cls, ct_field_name, oid_field_name):
+        """
+        Appends the composite (ct, oid) index to cls._meta.indexes, unless the
+        model already declares one on the same columns.
+        """
+        fields = [ct_field_name, oid_field_name]
+        if any(list(idx.fields) == fields for idx in cls._meta.indexes):
+            return
+        # include/condition require an explicit name: reuse Django's naming scheme
+        named = models.Index(fields=fields)
+        named.set_name_with_model(cls)
+        index_kwargs = {"fields": fields, "name": named.name}
+        if self.pair_index_include:
+            index_kwargs["include"] = list(self.pair_index_include)
+        if self.pair_index_partial:
+            index_kwargs["condition"] = models.Q(**{f"{ct_field_name}__isnull": False})
+        # new list: never mutate a list shared with a parent Meta
+        cls._meta.indexes = [*cls._meta.indexes, models.Index(**index_kwargs)]
+        # the migration state only serializes Meta options present in original_attrs
+        cls._meta.original_attrs["indexes"] = cls._meta.indexes
+
+    def _contribute_pair_constraint(self, cls, name, ct_field_name, oid_field_name):
+        """
+        Appends a CheckConstraint requiring (ct, oid) to be both NULL or both set.
+        """
+        ct_null = cls._meta.get_field(ct_field_name).null
+        oid_null = cls._meta.get_field(oid_field_name).null
+        if not (ct_null or oid_null):
+            # NOT NULL columns already enforce the pair
+            return
+        cond = (
+            models.Q(**{f"{ct_field_name}__isnull": True, f"{oid_field_name}__isnull": True})
+            | models.Q(**{f"{ct_field_name}__isnull": False, f"{oid_field_name}__isnull": False})
+        )
+        # same scheme as Index.set_name_with_model(): truncated table and field
+        # names plus a hash, within the 30 characters of models.E034 (and Oracle)
+        _, table_name = split_identifier(cls._meta.db_table)
+        digest = names_digest(table_name, name, length=6)
+        constraint_name = f"{table_name[:10]}_{name[:7]}_{digest}_pair"
+        if constraint_name[0] == "_" or constraint_name[0].isdigit():
+            constraint_name = f"D{constraint_name[1:]}"
+        # Django 5.1 renamed CheckConstraint(check=...) to condition=...
+        cond_kwarg = "condition" if django.VERSION >= (5, 1) else "check"
+        constraint = models.CheckConstraint(name=constraint_name, **{cond_kwarg: cond})
+        cls._meta.constraints = [*cls._meta.constraints, constraint]
+        cls._meta.original_attrs["constraints"] = cls._meta.constraints
     def contribute_to_class(self, cls, name, private_only=False):
         ct_field_name = self._user_ct_field or f"{name}_content_type"
         oid_field_name = self._user_oid_field or f"{name}_object_id"
@@ -113,7 +213,12 @@ class AutoGenericForeignKey(GenericForeignKey):
                 }
                 if self._auto_null and "default" not in oid_kwargs:
                     oid_kwargs["default"] = None
-                oid = models.PositiveIntegerField(**oid_kwargs)
+                if isinstance(self.oid_type, str):
+                    oid_cls, extra = OID_FIELD_TYPES[self.oid_type]
+                    oid_kwargs = {**extra, **oid_kwargs}
+                else:
+                    oid_cls = self.oid_type
+                oid = oid_cls(**oid_kwargs)
                 oid.contribute_to_class(cls, oid_field_name)
         else:
             # Custom fields: ensure they EXIST
@@ -132,12 +237,19 @@ class AutoGenericForeignKey(GenericForeignKey):
         self.name = name
 
         super().contribute_to_class(cls, name)
-        # Metadata for Admin
-        if not hasattr(cls, "_autogfk_fields"):
-            cls._autogfk_fields = {}
+        # Abstract models hand a copy of this field to each concrete subclass, which adds its own index;
+        # multi-table children inherit a copy too, but the columns (and the index) live on the parent
+        if self.pair_index and not cls._meta.abstract and not getattr(self, "mti_inherited", False):
+            self._contribute_pair_index(cls, ct_field_name, oid_field_name)
+        if self.pair_constraint and not cls._meta.abstract and not getattr(self, "mti_inherited", False):
+            self._contribute_pair_constraint(cls, name, ct_field_name, oid_field_name)
+        # Metadata for Admin (own dict per class, so subclasses don't write into their parents')
+        if "_autogfk_fields" not in cls.__dict__:
+            cls._autogfk_fields = dict(getattr(cls, "_autogfk_fields", {}))
         cls._autogfk_fields[name] = {
             "ct_field": ct_field_name,
             "oid_field": oid_field_name,
             "limit_choices_to": self.limit_choices_to,  # can be None for custom fields
             "label": self.label or name.replace("_", " ").title(),
+            "pair_constraint": self.pair_constraint,
         }
\ No newline at end of file
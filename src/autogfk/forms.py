@@ -1,12 +1,17 @@
 from __future__ import annotations
 from typing import Optional
 from django import forms
+from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
 
 class AutoGenericForeignKeyFormField(forms.MultiValueField):
-    def __init__(self, *, label: Optional[str] = None, required: bool = False, limit_ct_qs=None):
+    def __init__(self, *, label: Optional[str] = None, required: bool = False, limit_ct_qs=None, oid_to_python=None):
+        # converts the posted object id to the oid column type (e.g. oid_model_field.to_python)
+        self.oid_to_python = oid_to_python or int
         fields = (
-            forms.ModelChoiceField(queryset=limit_ct_qs or ContentType.objects.all(), required=required),
+            forms.ModelChoiceField(
+                queryset=limit_ct_qs if limit_ct_qs is not None else ContentType.objects.all(), required=required,
+            ),
             forms.CharField(required=required),
         )
         super().__init__(fields=fields, require_all_fields=False, label=label, required=required)
@@ -17,4 +22,8 @@ class AutoGenericForeignKeyFormField(forms.MultiValueField):
         ct, oid = data_list
         if not ct or not oid:
             return {"content_type": None, "object_id": None}
-        return {"content_type": ct, "object_id": int(oid)}
+        try:
+            oid = self.oid_to_python(oid)
+        except (TypeError, ValueError) as e:
+            raise ValidationError("Invalid object id.", code="invalid") from e
+        return {"content_type": ct, "object_id": oid}
@@ -22,4 +22,7 @@ class AutoGenericForeignKeyPolymorphicManager(PolymorphicManager):
     def get_queryset(self):
         return self.queryset_class(self.model, using=self._db)
 
+    def prefetch_gfk(self, *names, querysets=None):
+        return self.get_queryset().prefetch_gfk(*names, querysets=querysets)
+
 
@@ -1,6 +1,7 @@
 from django.db import models
 from ..managers import AutoGenericForeignKeyManager
-from ..query import _gfk_map_for_model, _normalize_obj
+from ..query import _normalize_obj
+from ..registry import get_gfk_map, get_save_checked_pairs
 
 
 class AutoGenericForeignKeyModel(models.Model):
@@ -20,7 +21,7 @@ class AutoGenericForeignKeyModel(models.Model):
         Supported values: model instance; (ct|ct_id, object_id); {content_type, object_id}; None.
         """
         if kwargs:
-            mapping = _gfk_map_for_model(self.__class__)
+            mapping = get_gfk_map(self.__class__)
             # Work on a copy of keys to allow popping while iterating
             for key in list(kwargs.keys()):
                 if key not in mapping:
@@ -42,9 +43,9 @@ class AutoGenericForeignKeyModel(models.Model):
         This hook doesn't change normal Django behavior when the logical GFK
         descriptor is used (assigning a model instance). It only ensures that
         when either side is None, both are None, keeping the pair consistent.
+        Pairs declared with pair_constraint=True are left to the database.
         """
-        mapping = _gfk_map_for_model(self.__class__)
-        for _, (ct_field, oid_field) in mapping.items():
+        for ct_field, oid_field in get_save_checked_pairs(self.__class__):
             ct_val = getattr(self, ct_field)
             oid_val = getattr(self, oid_field)
             if (ct_val is None) != (oid_val is None):
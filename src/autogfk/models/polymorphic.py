@@ -1,6 +1,7 @@
 from django.core.exceptions import ImproperlyConfigured
 from ..managers import AutoGenericForeignKeyPolymorphicManager
-from ..query import _gfk_map_for_model, _normalize_obj
+from ..query import _normalize_obj
+from ..registry import get_gfk_map, get_save_checked_pairs
 try:
     from polymorphic.models import PolymorphicModel
 except Exception as e:  # pragma: no cover
@@ -22,7 +23,7 @@ class AutoGenericForeignKeyPolymorphicModel(PolymorphicModel):
     def __init__(self, *args, **kwargs):
         # Same logic as non-polymorphic base: accept logical GFK in kwargs
         if kwargs:
-            mapping = _gfk_map_for_model(self.__class__)
+            mapping = get_gfk_map(self.__class__)
             for key in list(kwargs.keys()):
                 if key not in mapping:
                     continue
@@ -39,8 +40,7 @@ class AutoGenericForeignKeyPolymorphicModel(PolymorphicModel):
 
     def save(self, *args, **kwargs):
         # Ensure no partial ct/oid pairs are persisted
-        mapping = _gfk_map_for_model(self.__class__)
-        for _, (ct_field, oid_field) in mapping.items():
+        for ct_field, oid_field in get_save_checked_pairs(self.__class__):
             ct_val = getattr(self, ct_field)
             oid_val = getattr(self, oid_field)
             if (ct_val is None) != (oid_val is None):
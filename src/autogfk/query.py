@@ -1,11 +1,14 @@
 # src/autogfk/query.py
 from __future__ import annotations
-from typing import Any, Iterable, Tuple
+from itertools import islice
+from typing import Any, Iterable, Mapping, Tuple
+from asgiref.sync import sync_to_async
 from django.db import models
-from django.db.models import Q
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models import Exists, OuterRef, Q
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from .contenttypes import allowed_content_type_ids, get_content_type, get_limit_choices_to
+from .registry import get_gfk_map
 
 try:
     from polymorphic.query import PolymorphicQuerySet
@@ -17,25 +20,14 @@ except Exception as e:  # pragma: no cover
 
 
 
-def _gfk_map_for_model(model: type[models.Model]) -> dict[str, Tuple[str, str]]:
+def _gfk_map_for_model(model: type[models.Model]) -> Mapping[str, Tuple[str, str]]:
     """
     Maps <gfk_name> -> (ct_field_name, oid_field_name) for:
       - AutoGenericForeignKey (via model._autogfk_fields)
       - Native GenericForeignKey (via _meta.private_fields)
+    Read from the precomputed registry (see autogfk.registry).
     """
-    mapping: dict[str, Tuple[str, str]] = {}
-
-    # AutoGenericForeignKey registers metadata here:
-    auto = getattr(model, "_autogfk_fields", {}) or {}
-    for name, meta in auto.items():
-        mapping[name] = (meta["ct_field"], meta["oid_field"])
-
-    # Native GFK lives in private_fields
-    for f in getattr(model._meta, "private_fields", []):
-        if isinstance(f, GenericForeignKey):
-            mapping.setdefault(f.name, (f.ct_field, f.fk_field))
-
-    return mapping
+    return get_gfk_map(model)
 
 
 def _split_lookup(key: str) -> tuple[str, str]:
@@ -62,40 +54,172 @@ def _normalize_obj(value: Any) -> tuple[ContentType, Any] | None:
         oid = value.get("object_id")
         if ct is None or oid is None:
             raise ValueError("Dict for GFK must contain 'content_type' and 'object_id'.")
-        ct = ContentType.objects.get(pk=getattr(ct, "pk", ct))
-        return ct, oid
+        return get_content_type(ct), oid
     if isinstance(value, tuple) and len(value) == 2:
         ct, oid = value
-        ct = ContentType.objects.get(pk=getattr(ct, "pk", ct))
-        return ct, oid
+        return get_content_type(ct), oid
     # model instance
     if isinstance(value, models.Model):
-        ct = ContentType.objects.get_for_model(value)  # GenericForeignKey default: concrete model
-        return ct, value.pk
+        return get_content_type(value), value.pk  # GenericForeignKey default: concrete model
     raise ValueError(f"Unsupported value for GFK lookup: {value!r}")
 
 
+def _normalize_many(items: Iterable[Any]) -> list[tuple[ContentType, Any] | None]:
+    """
+    Bulk counterpart of _normalize_obj: resolves every content type in one pass.
+
+    Model instances are grouped by class and resolved with a single
+    ContentType.objects.get_for_models() call; ct ids go through the manager's
+    shared cache (get_for_id), so repeated ids cost nothing.
+    """
+    items = list(items)
+    model_classes = {type(it) for it in items if isinstance(it, models.Model)}
+    ct_for_model = ContentType.objects.get_for_models(*model_classes) if model_classes else {}
+
+    normalized: list[tuple[ContentType, Any] | None] = []
+    for it in items:
+        if it is None:
+            normalized.append(None)
+        elif isinstance(it, models.Model):
+            normalized.append((ct_for_model[type(it)], it.pk))
+        elif isinstance(it, dict):
+            ct = it.get("content_type")
+            oid = it.get("object_id")
+            if ct is None or oid is None:
+                raise ValueError("Dict for GFK must contain 'content_type' and 'object_id'.")
+            normalized.append((get_content_type(ct), oid))
+        elif isinstance(it, tuple) and len(it) == 2:
+            normalized.append((get_content_type(it[0]), it[1]))
+        else:
+            raise ValueError(f"Unsupported value for GFK lookup: {it!r}")
+    return normalized
+
+
+def _yields_children(qs: models.QuerySet) -> bool:
+    # polymorphic querysets return child instances (unless non_polymorphic())
+    return isinstance(qs, PolymorphicQuerySet) and not qs.polymorphic_disabled
+
+
 def _pairs_q(field: str, items: Iterable[Any], mapping: dict[str, Tuple[str, str]]) -> Q:
     """
-    Builds Q with OR of pairs (ct=id & oid=id) for '__in'.
+    Builds Q for '__in', grouping the object ids by content type:
+    (ct=X & oid IN (...)) | (ct=Z & oid IN (...)).
+
+    QuerySets (alone or mixed in a list) are never evaluated: each one becomes
+    ct=<ct of qs.model> & oid IN (SELECT pk ...), one branch per model.
+    Polymorphic querysets match each row by its polymorphic_ctype instead
+    (EXISTS subquery), as their rows are the child classes. Plain multi-table
+    querysets of a parent model only match pairs pointing to the parent.
     """
     ct_field, oid_field = mapping[field]
-    items = list(items)
-    if not items:
+    if isinstance(items, models.QuerySet):
+        subqueries, items = [items], []
+    else:
+        items = list(items)
+        subqueries = [it for it in items if isinstance(it, models.QuerySet)]
+        if subqueries:
+            items = [it for it in items if not isinstance(it, models.QuerySet)]
+    normalized = _normalize_many(items)
+    if not normalized and not subqueries:
         # empty should return empty set
         return Q(pk__in=[])  # force empty
-    q = Q()
-    for it in items:
-        norm = _normalize_obj(it)
+    # dict keys keep insertion order and drop duplicate ids
+    by_ct: dict[ContentType, dict[Any, None]] = {}
+    has_null = False
+    for norm in normalized:
         if norm is None:
-            # treat None inside __in as "empty": ct IS NULL AND oid IS NULL
-            q |= Q(**{f"{ct_field}__isnull": True, f"{oid_field}__isnull": True})
+            has_null = True
+            continue
+        ct, oid = norm
+        by_ct.setdefault(ct, {})[oid] = None
+    q = Q()
+    for ct, oids in by_ct.items():
+        oids = list(oids)
+        if len(oids) == 1:
+            q |= Q(**{ct_field: ct, oid_field: oids[0]})
         else:
-            ct, oid = norm
-            q |= Q(**{ct_field: ct, oid_field: oid})
+            q |= Q(**{ct_field: ct, f"{oid_field}__in": oids})
+    for sq in [sq for sq in subqueries if _yields_children(sq)]:
+        # rows are returned as their child classes, so each row's GFK content type
+        # is its polymorphic_ctype, not the content type of sq.model
+        q |= Q(Exists(sq.filter(pk=OuterRef(oid_field), polymorphic_ctype=OuterRef(ct_field))))
+    subqueries = [sq for sq in subqueries if not _yields_children(sq)]
+    if subqueries:
+        ct_for_model = ContentType.objects.get_for_models(*{sq.model for sq in subqueries})
+        by_model: dict[type[models.Model], Q] = {}
+        for sq in subqueries:
+            by_model[sq.model] = by_model.get(sq.model, Q()) | Q(**{f"{oid_field}__in": sq.values("pk")})
+        for sq_model, oid_q in by_model.items():
+            q |= Q(**{ct_field: ct_for_model[sq_model]}) & oid_q
+    if has_null:
+        # treat None inside __in as "empty": ct IS NULL AND oid IS NULL
+        q |= Q(**{f"{ct_field}__isnull": True, f"{oid_field}__isnull": True})
+    return q
+
+
+def _target_q(model: type[models.Model], field: str, path: str, val: Any, mapping) -> Q:
+    """
+    Lookup through the GFK into target fields ("owner__name__icontains"): for every
+    allowed content type whose model has the field, builds
+    ct=X & oid IN (SELECT pk FROM target WHERE <path>=<val>).
+    """
+    ct_field, oid_field = mapping[field]
+    if not get_limit_choices_to(model, field):
+        raise NotImplementedError(
+            f"Lookup '{path}' through GenericForeignKey '{field}' needs limit_choices_to: without it "
+            "the query would have one subquery per installed model."
+        )
+    attr = path.split("__", 1)[0]
+    q = Q()
+    matched = False
+    for ct_id in allowed_content_type_ids(model, field):
+        try:
+            ct = get_content_type(ct_id)
+        except ContentType.DoesNotExist:
+            continue
+        target = ct.model_class()
+        if target is None:
+            continue
+        if attr != "pk":
+            try:
+                target._meta.get_field(attr)
+            except FieldDoesNotExist:
+                continue
+        matched = True
+        subquery = target._base_manager.filter(**{path: val}).values("pk")
+        q |= Q(**{ct_field: ct, f"{oid_field}__in": subquery})
+    if not matched:
+        raise NotImplementedError(
+            f"Lookup '{path}' not supported for GenericForeignKey '{field}'. "
+            "Supported: exact, in, isnull, type, type__in, or a field of one of the allowed target models."
+        )
     return q
 
 
+def _gfk_condition(model: type[models.Model], field: str, lookup: str, val: Any, mapping) -> Q:
+    """
+    Translates one lookup on a GFK into a single Q over its physical fields, so the
+    pair is never split by an OR connector.
+    """
+    ct_field, oid_field = mapping[field]
+    if lookup in ("exact",):
+        norm = _normalize_obj(val)
+        if norm is None:
+            return Q(**{f"{ct_field}__isnull": True, f"{oid_field}__isnull": True})
+        ct, oid = norm
+        return Q(**{ct_field: ct, oid_field: oid})
+    if lookup == "in":
+        return _pairs_q(field, val, mapping)
+    if lookup == "isnull":
+        truthy = bool(val)
+        return Q(**{f"{ct_field}__isnull": truthy, f"{oid_field}__isnull": truthy})
+    if lookup == "type":
+        return Q(**{ct_field: get_content_type(val)})
+    if lookup == "type__in":
+        return Q(**{f"{ct_field}__in": [get_content_type(v) for v in val]})
+    return _target_q(model, field, lookup, val, mapping)
+
+
 def _rewrite_kwargs_to_q(model: type[models.Model], kwargs: dict[str, Any]) -> tuple[Q, dict[str, Any]]:
     """
     Separates kwargs into:
@@ -110,32 +234,7 @@ def _rewrite_kwargs_to_q(model: type[models.Model], kwargs: dict[str, Any]) -> t
         if field not in mapping:
             rest[key] = val
             continue
-
-        ct_field, oid_field = mapping[field]
-
-        if lookup in ("exact",):
-            norm = _normalize_obj(val)
-            if norm is None:
-                q &= Q(**{f"{ct_field}__isnull": True, f"{oid_field}__isnull": True})
-            else:
-                ct, oid = norm
-                q &= Q(**{ct_field: ct, oid_field: oid})
-
-        elif lookup == "in":
-            q &= _pairs_q(field, val, mapping)
-
-        elif lookup == "isnull":
-            truthy = bool(val)
-            if truthy:
-                q &= Q(**{f"{ct_field}__isnull": True, f"{oid_field}__isnull": True})
-            else:
-                q &= Q(**{f"{ct_field}__isnull": False, f"{oid_field}__isnull": False})
-
-        else:
-            raise NotImplementedError(
-                f"Lookup '{lookup}' not supported for GenericForeignKey '{field}'. "
-                "Supported: exact, in, isnull."
-            )
+        q &= _gfk_condition(model, field, lookup, val, mapping)
     return q, rest
 
 
@@ -155,28 +254,7 @@ def _rewrite_q_obj(model: type[models.Model], expr: Q) -> Q:
         if field not in mapping:
             new_children.append((key, val))
             continue
-
-        ct_field, oid_field = mapping[field]
-        if lookup in ("exact",):
-            norm = _normalize_obj(val)
-            if norm is None:
-                new_children.append((f"{ct_field}__isnull", True))
-                new_children.append((f"{oid_field}__isnull", True))
-            else:
-                ct, oid = norm
-                new_children.append((ct_field, ct))
-                new_children.append((oid_field, oid))
-        elif lookup == "in":
-            new_children.append(_pairs_q(field, val, mapping))
-        elif lookup == "isnull":
-            truthy = bool(val)
-            new_children.append((f"{ct_field}__isnull", truthy))
-            new_children.append((f"{oid_field}__isnull", truthy))
-        else:
-            raise NotImplementedError(
-                f"Lookup '{lookup}' not supported for GenericForeignKey '{field}'. "
-                "Supported: exact, in, isnull."
-            )
+        new_children.append(_gfk_condition(model, field, lookup, val, mapping))
     q2 = Q()
     q2.connector = expr.connector
     q2.negated = expr.negated
@@ -184,18 +262,192 @@ def _rewrite_q_obj(model: type[models.Model], expr: Q) -> Q:
     return q2
 
 
+def prefetch_gfk_objects(instances: Iterable[models.Model], names: Iterable[str], querysets: Iterable[models.QuerySet] = ()) -> None:
+    """
+    Loads the targets of the GFKs `names` for all `instances` with one query per
+    content type and stores them in each GFK descriptor cache, so reading
+    `instance.<name>` afterwards doesn't hit the database.
+
+    `querysets` optionally customizes the query per target model
+    (e.g. User.objects.select_related("profile").only(...)).
+    """
+    instances = [inst for inst in instances if inst is not None]
+    names = list(names)
+    if not instances or not names:
+        return
+    db = instances[0]._state.db
+    overrides = {qs.model: qs for qs in querysets}
+
+    # Polymorphic querysets may yield several classes: resolve fields once per class
+    fields_by_class: dict[type[models.Model], list] = {}
+    pending = []
+    wanted: dict[Any, set] = {}
+    for inst in instances:
+        cls = type(inst)
+        fields = fields_by_class.get(cls)
+        if fields is None:
+            mapping = _gfk_map_for_model(cls)
+            fields = fields_by_class[cls] = [
+                (cls._meta.get_field(name), cls._meta.get_field(mapping[name][0]).attname, mapping[name][1])
+                for name in names
+            ]
+        for gfk, ct_attname, oid_attname in fields:
+            ct_id = getattr(inst, ct_attname)
+            oid = getattr(inst, oid_attname)
+            if ct_id is None or oid is None:
+                gfk.set_cached_value(inst, None)
+                continue
+            wanted.setdefault(ct_id, set()).add(oid)
+            pending.append((inst, gfk, ct_id, oid))
+
+    found: dict[tuple[Any, Any], models.Model] = {}
+    targets: dict[Any, type[models.Model] | None] = {}
+    for ct_id, oids in wanted.items():
+        try:
+            target = ContentType.objects.db_manager(db).get_for_id(ct_id).model_class()
+        except ContentType.DoesNotExist:
+            # row removed by remove_stale_contenttypes; no target either way
+            target = None
+        targets[ct_id] = target
+        if target is None:
+            continue
+        qs = overrides.get(target)
+        if qs is None:
+            qs = target._base_manager.db_manager(db).all()
+        for obj in qs.filter(pk__in=oids):
+            found[(ct_id, obj.pk)] = obj
+
+    for inst, gfk, ct_id, oid in pending:
+        target = targets[ct_id]
+        if target is None:
+            gfk.set_cached_value(inst, None)
+            continue
+        gfk.set_cached_value(inst, found.get((ct_id, target._meta.pk.to_python(oid))))
+
+
 class AutoGenericForeignKeyRewriteMixin:
     """
     QuerySet mixin: rewrites filters on GenericForeignKey/AutoGenericForeignKey
     and then delegates to super() — to coexist with PolymorphicQuerySet (and others).
     """
     def _rewrite_args_kwargs(self, *args: Q, **kwargs: Any):
+        if not _gfk_map_for_model(self.model):
+            # nothing to rewrite on models without GFKs
+            return list(args), kwargs
         q_gfk, rest = _rewrite_kwargs_to_q(self.model, kwargs)
         new_args = [_rewrite_q_obj(self.model, a) for a in args]
         if q_gfk.children:
             new_args.append(q_gfk)
         return new_args, rest
 
+    # --- GFK prefetching ---
+    _autogfk_prefetch: tuple[str, ...] = ()
+    _autogfk_prefetch_querysets: tuple[models.QuerySet, ...] = ()
+    _autogfk_prefetch_done = False
+
+    def _clone(self, *args, **kwargs):
+        c = super()._clone(*args, **kwargs)
+        c._autogfk_prefetch = self._autogfk_prefetch
+        c._autogfk_prefetch_querysets = self._autogfk_prefetch_querysets
+        return c
+
+    def prefetch_gfk(self, *names, querysets=None):
+        """
+        Loads the targets of the given GFKs with one query per content type when
+        the queryset is evaluated. `querysets` customizes the query per target
+        model. prefetch_gfk(None) clears the list, like prefetch_related(None).
+        """
+        clone = self._chain()
+        if names == (None,):
+            clone._autogfk_prefetch = ()
+            clone._autogfk_prefetch_querysets = ()
+            return clone
+        mapping = _gfk_map_for_model(self.model)
+        for name in names:
+            if name not in mapping:
+                raise ValueError(f"'{name}' is not a GenericForeignKey on {self.model.__name__}.")
+        clone._autogfk_prefetch = tuple(dict.fromkeys(self._autogfk_prefetch + names))
+        clone._autogfk_prefetch_querysets = self._autogfk_prefetch_querysets + tuple(querysets or ())
+        return clone
+
+    def _fetch_all(self):
+        super()._fetch_all()
+        if self._autogfk_prefetch and not self._autogfk_prefetch_done:
+            # values()/values_list() rows have no descriptors to fill
+            rows = [r for r in self._result_cache if isinstance(r, models.Model)]
+            prefetch_gfk_objects(rows, self._autogfk_prefetch, self._autogfk_prefetch_querysets)
+            self._autogfk_prefetch_done = True
+
+    def iterator(self, chunk_size=None):
+        """
+        With prefetch_gfk(), targets are loaded per chunk of `chunk_size` rows
+        (required, as for prefetch_related()).
+        """
+        if not self._autogfk_prefetch:
+            return super().iterator(chunk_size)
+        if chunk_size is None:
+            raise ValueError("chunk_size must be provided when using QuerySet.iterator() after prefetch_gfk().")
+        return self._prefetch_gfk_chunks(super().iterator(chunk_size), chunk_size)
+
+    def _prefetch_gfk_chunks(self, rows, chunk_size):
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            prefetch_gfk_objects(
+                [r for r in chunk if isinstance(r, models.Model)],
+                self._autogfk_prefetch,
+                self._autogfk_prefetch_querysets,
+            )
+            yield from chunk
+
+    async def aiterator(self, chunk_size=2000):
+        if not self._autogfk_prefetch:
+            async for row in super().aiterator(chunk_size):
+                yield row
+            return
+        chunk = []
+        async for row in super().aiterator(chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                await self._aprefetch_gfk(chunk)
+                for r in chunk:
+                    yield r
+                chunk = []
+        if chunk:
+            await self._aprefetch_gfk(chunk)
+            for r in chunk:
+                yield r
+
+    async def _aprefetch_gfk(self, chunk):
+        await sync_to_async(prefetch_gfk_objects)(
+            [r for r in chunk if isinstance(r, models.Model)],
+            self._autogfk_prefetch,
+            self._autogfk_prefetch_querysets,
+        )
+
+    def order_by(self, *field_names):
+        """
+        Accepts "<gfk>__type" (orders by the content type column) and "<gfk>"
+        (content type, then object id), with an optional "-" prefix.
+        """
+        mapping = _gfk_map_for_model(self.model)
+        if mapping:
+            rewritten = []
+            for name in field_names:
+                if not isinstance(name, str):
+                    rewritten.append(name)
+                    continue
+                sign = "-" if name.startswith("-") else ""
+                field, lookup = _split_lookup(name.lstrip("-"))
+                if field in mapping and lookup in ("exact", "type"):
+                    ct_field, oid_field = mapping[field]
+                    rewritten.append(f"{sign}{ct_field}")
+                    if lookup == "exact":
+                        rewritten.append(f"{sign}{oid_field}")
+                else:
+                    rewritten.append(name)
+            field_names = rewritten
+        return super().order_by(*field_names)
+
     def filter(self, *args, **kwargs):
         new_args, rest = self._rewrite_args_kwargs(*args, **kwargs)
         return super().filter(*new_args, **rest)
@@ -218,23 +470,7 @@ class AutoGenericForeignKeyRewriteMixin:
         """
         if not payload:
             return payload or {}
-        mapping = _gfk_map_for_model(self.model)
-        new_payload = dict(payload)
-        for key in list(payload.keys()):
-            if key not in mapping:
-                continue
-            ct_field, oid_field = mapping[key]
-            norm = _normalize_obj(payload[key])
-            if norm is None:
-                new_payload[ct_field] = None
-                new_payload[oid_field] = None
-            else:
-                ct, oid = norm
-                new_payload[ct_field] = ct
-                new_payload[oid_field] = oid
-            # remove logical key
-            new_payload.pop(key, None)
-        return new_payload
+        return self._rewrite_payloads_for_write([payload])[0]
 
     def create(self, **kwargs):
         kwargs2 = self._rewrite_payload_for_write(kwargs)
@@ -263,6 +499,87 @@ class AutoGenericForeignKeyRewriteMixin:
             return models.QuerySet.update_or_create(narrowed, defaults=defaults2, **lookup_rest)
         return super().update_or_create(defaults=defaults2, **lookup_rest)
 
+    # --- bulk helpers ---
+    def _rewrite_payloads_for_write(self, payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Batch version of _rewrite_payload_for_write: all logical GFK values of all
+        payloads are normalized together, so content types are resolved once per batch.
+        """
+        mapping = _gfk_map_for_model(self.model)
+        slots = [(i, key) for i, payload in enumerate(payloads) for key in payload if key in mapping]
+        if not slots:
+            return payloads
+        normalized = _normalize_many(payloads[i][key] for i, key in slots)
+        new_payloads = [dict(payload) for payload in payloads]
+        for (i, key), norm in zip(slots, normalized):
+            ct_field, oid_field = mapping[key]
+            new_payloads[i][ct_field], new_payloads[i][oid_field] = norm if norm is not None else (None, None)
+            # remove logical key
+            new_payloads[i].pop(key, None)
+        return new_payloads
+
+    def _sync_gfk_columns(self, objs: list[models.Model], names: Iterable[str]) -> None:
+        """
+        Copies the targets held in the GFK descriptor caches (obj.<name> = target)
+        into the physical ct/oid columns, so targets saved after the assignment
+        still get their ids. Like Model._prepare_related_fields_for_save(), only
+        rows whose object id is still empty are filled: columns set explicitly
+        win over a stale cached target. One content-type resolution per GFK for
+        the whole batch.
+        """
+        mapping = _gfk_map_for_model(self.model)
+        for name in names:
+            gfk = self.model._meta.get_field(name)
+            ct_attname = self.model._meta.get_field(mapping[name][0]).attname
+            oid_field = mapping[name][1]
+            pending = []
+            for obj in objs:
+                if getattr(obj, oid_field) not in (None, ""):
+                    continue
+                target = gfk.get_cached_value(obj, default=None)
+                if target is not None and target.pk is not None:
+                    pending.append((obj, target))
+            if not pending:
+                continue
+            ct_for_model = ContentType.objects.db_manager(self.db).get_for_models(
+                *{type(target) for _, target in pending},
+                for_concrete_models=gfk.for_concrete_model,
+            )
+            for obj, target in pending:
+                setattr(obj, ct_attname, ct_for_model[type(target)].pk)
+                setattr(obj, oid_field, target.pk)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Accepts model instances and/or payload dicts using logical GFK keys
+        (same values as create()).
+        """
+        objs = list(objs)
+        payload_idx = [i for i, obj in enumerate(objs) if isinstance(obj, dict)]
+        if payload_idx:
+            payloads = self._rewrite_payloads_for_write([objs[i] for i in payload_idx])
+            for i, payload in zip(payload_idx, payloads):
+                objs[i] = self.model(**payload)
+        self._sync_gfk_columns(objs, _gfk_map_for_model(self.model))
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """
+        Logical GFK names in `fields` are expanded to their ct/oid columns.
+        """
+        mapping = _gfk_map_for_model(self.model)
+        logical = [f for f in fields if f in mapping]
+        if logical:
+            objs = list(objs)
+            self._sync_gfk_columns(objs, logical)
+            expanded = []
+            for f in fields:
+                for physical in (mapping[f] if f in mapping else (f,)):
+                    if physical not in expanded:
+                        expanded.append(physical)
+            fields = expanded
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 class AutoGenericForeignKeyQuerySet(AutoGenericForeignKeyRewriteMixin, models.QuerySet):
     pass
 
@@ -0,0 +1,97 @@
+# src/autogfk/registry.py
+from __future__ import annotations
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping, Tuple
+from django.apps import apps
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.core.signals import setting_changed
+from django.db import models
+from django.db.models.signals import class_prepared
+
+# model -> (specs, pair map, pairs checked in save()); all read-only
+_registry: dict[type[models.Model], tuple[Mapping[str, Mapping[str, Any]], Mapping[str, Tuple[str, str]], Tuple[Tuple[str, str], ...]]] = {}
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+def _build(model: type[models.Model]):
+    """
+    Collects the GFK specs of a model:
+      - AutoGenericForeignKey (via model._autogfk_fields), _source="autogfk"
+      - Native GenericForeignKey (via _meta.private_fields), _source="plain_gfk"
+    """
+    specs: dict[str, Mapping[str, Any]] = {}
+    for name, meta in (getattr(model, "_autogfk_fields", {}) or {}).items():
+        specs[name] = MappingProxyType({**meta, "_source": "autogfk"})
+    for f in getattr(model._meta, "private_fields", []):
+        if isinstance(f, GenericForeignKey) and f.name not in specs:
+            specs[f.name] = MappingProxyType({
+                "ct_field": f.ct_field,
+                "oid_field": f.fk_field,
+                "limit_choices_to": None,  # read from the CT FK at runtime
+                "label": getattr(f, "verbose_name", None) or f.name.replace("_", " ").title(),
+                "_source": "plain_gfk",
+            })
+    if not specs:
+        return _EMPTY, _EMPTY, ()
+    pairs = {name: (meta["ct_field"], meta["oid_field"]) for name, meta in specs.items()}
+    # pairs guarded by a database CheckConstraint don't need the Python fix-up on save()
+    save_checked = tuple(pairs[name] for name, meta in specs.items() if not meta.get("pair_constraint"))
+    return MappingProxyType(specs), MappingProxyType(pairs), save_checked
+
+
+def _entry(model: type[models.Model]):
+    entry = _registry.get(model)
+    if entry is None:
+        # Models prepared before autogfk was imported (or after a clear()) are built lazily
+        entry = _registry[model] = _build(model)
+    return entry
+
+
+def get_gfk_specs(model: type[models.Model]) -> Mapping[str, Mapping[str, Any]]:
+    """
+    Returns <gfk_name> -> spec (ct_field, oid_field, limit_choices_to, label, _source).
+    """
+    return _entry(model)[0]
+
+
+def get_gfk_map(model: type[models.Model]) -> Mapping[str, Tuple[str, str]]:
+    """
+    Returns <gfk_name> -> (ct_field_name, oid_field_name).
+    """
+    return _entry(model)[1]
+
+
+def get_save_checked_pairs(model: type[models.Model]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Returns the (ct_field_name, oid_field_name) pairs that save() must keep
+    consistent in Python (those without a pair CheckConstraint).
+    """
+    return _entry(model)[2]
+
+
+def iter_gfk_specs() -> Iterator[tuple[type[models.Model], str, Mapping[str, Any]]]:
+    """
+    Yields (model, gfk_name, spec) for every GFK of every installed model.
+    """
+    for model in apps.get_models():
+        for name, spec in get_gfk_specs(model).items():
+            yield model, name, spec
+
+
+def clear() -> None:
+    _registry.clear()
+
+
+def _on_class_prepared(sender, **kwargs):
+    _registry[sender] = _build(sender)
+
+
+def _on_setting_changed(setting, **kwargs):
+    # override_settings(INSTALLED_APPS=...) reloads the app registry
+    if setting == "INSTALLED_APPS":
+        clear()
+
+
+class_prepared.connect(_on_class_prepared, dispatch_uid="autogfk.registry.class_prepared")
+setting_changed.connect(_on_setting_changed, dispatch_uid="autogfk.registry.setting_changed")
@@ -0,0 +1,93 @@
+# src/autogfk/resolver.py
+from __future__ import annotations
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.urls import NoReverseMatch, reverse
+from .autocomplete import label_queryset, render_label, search_queryset
+from .contenttypes import get_model
+
+
+def pair_key(ct_id: Any, oid: Any) -> tuple[int, str]:
+    """
+    Key of a (ct, oid) pair in the dict returned by resolve_labels().
+    """
+    return int(getattr(ct_id, "pk", ct_id)), str(oid)
+
+
+def admin_urls(model: type[models.Model], admin_site=None) -> dict[str, Optional[str]]:
+    """
+    Admin popup URLs of `model`: {"add": ..., "change_template": ...} where the
+    template has "__fk__" in place of the object id. None when not in the admin.
+    """
+    site = admin_site or admin.site
+    opts = model._meta
+    query = f"?_to_field={opts.pk.attname}&_popup=1"
+    urls: dict[str, Optional[str]] = {}
+    for key, view, args in (("add", "add", ()), ("change_template", "change", ("__fk__",))):
+        try:
+            urls[key] = reverse(f"{site.name}:{opts.app_label}_{opts.model_name}_{view}", args=args) + query
+        except NoReverseMatch:
+            urls[key] = None
+    return urls
+
+
+def resolve_labels(
+    pairs: Iterable[tuple[Any, Any]],
+    *,
+    admin_site=None,
+    request=None,
+) -> dict[tuple[int, str], dict[str, Any]]:
+    """
+    Resolves many (ct, oid) pairs with one query per content type.
+
+    Returns pair_key(ct, oid) -> {"id", "text", "change_url"}; missing objects,
+    unknown content types and invalid ids are left out. Labels follow the
+    autocomplete label spec (autocomplete.register). With `request`, objects
+    are read through the same base queryset as the autocomplete view.
+    """
+    wanted: dict[int, set[str]] = defaultdict(set)
+    for ct_id, oid in pairs:
+        if ct_id in (None, "") or oid in (None, ""):
+            continue
+        try:
+            ct_key, oid_key = pair_key(ct_id, oid)
+        except (TypeError, ValueError):
+            continue
+        wanted[ct_key].add(oid_key)
+
+    resolved: dict[tuple[int, str], dict[str, Any]] = {}
+    for ct_id, oids in wanted.items():
+        try:
+            model = get_model(ct_id)
+        except ContentType.DoesNotExist:
+            continue
+        if model is None:
+            continue
+
+        pk_field = model._meta.pk
+        by_pk: dict[Any, list[str]] = defaultdict(list)
+        for oid in oids:
+            try:
+                by_pk[pk_field.to_python(oid)].append(oid)
+            except ValidationError:
+                continue
+        if not by_pk:
+            continue
+
+        qs = search_queryset(request, model, "") if request is not None else model._default_manager.all()
+        qs = label_queryset(model, qs.filter(pk__in=list(by_pk)))
+        change_template = admin_urls(model, admin_site)["change_template"]
+        for row in qs:
+            pk = row[pk_field.attname] if isinstance(row, dict) else row.pk
+            info = {
+                "id": pk,
+                "text": render_label(model, row),
+                "change_url": change_template.replace("__fk__", str(pk)) if change_template else None,
+            }
+            for oid in by_pk.get(pk, ()):
+                resolved[(ct_id, oid)] = info
+    return resolved
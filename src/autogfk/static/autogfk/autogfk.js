@@ -12,6 +12,136 @@
         }
     }
 
+    // Shared content type metadata ({choices, ctmap}) by json_script id
+    const ctMetaCache = {};
+
+    function readCtMeta(select) {
+        const id = select.getAttribute("data-autogfk-ct-meta");
+        if (id) {
+            if (!(id in ctMetaCache)) {
+                const el = document.getElementById(id);
+                try {
+                    ctMetaCache[id] = el ? JSON.parse(el.textContent) : null;
+                } catch (e) {
+                    ctMetaCache[id] = null;
+                }
+            }
+            if (ctMetaCache[id]) return ctMetaCache[id];
+        }
+        // older markup: per-widget data attributes
+        try {
+            return {
+                choices: JSON.parse(select.getAttribute("data-autogfk-choices") || "[]"),
+                ctmap: JSON.parse(select.getAttribute("data-autogfk-ctmap") || "[]"),
+            };
+        } catch (e) {
+            return { choices: [], ctmap: [] };
+        }
+    }
+
+    // Autocomplete responses by URL (ct, q, page/cursor), shared by every widget
+    // on the page; least recently used entries go first, and entries expire so
+    // objects added meanwhile (e.g. in another tab) show up
+    const RESULT_CACHE_SIZE = 200;
+    const RESULT_CACHE_TTL = 60000;
+    const resultCache = new Map();
+
+    function getJSON(url, signal) {
+        const key = String(url);
+        const hit = resultCache.get(key);
+        if (hit && Date.now() - hit.at < RESULT_CACHE_TTL) {
+            resultCache.delete(key);
+            resultCache.set(key, hit);
+            return Promise.resolve(hit.data);
+        }
+        return fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" }, signal: signal })
+            .then(function (r) {
+                if (!r.ok) throw new Error("HTTP " + r.status);
+                return r.json();
+            })
+            .then(function (data) {
+                resultCache.delete(key);
+                resultCache.set(key, { data: data, at: Date.now() });
+                if (resultCache.size > RESULT_CACHE_SIZE) {
+                    resultCache.delete(resultCache.keys().next().value);
+                }
+                return data;
+            });
+    }
+
+    // Preloaded (id, text) lists by choices URL + ct; null when the type is too big.
+    // They expire like resultCache entries (and on popup saves, see forgetResults)
+    const LOCAL_PAGE_SIZE = 30;
+    const preloaded = {};
+
+    function loadChoices(base, ctId) {
+        const url = new URL(base, window.location.origin);
+        url.searchParams.set("ct", ctId);
+        const key = String(url);
+        const hit = preloaded[key];
+        if (!hit || Date.now() - hit.at >= RESULT_CACHE_TTL) {
+            // revalidated with the ETag (If-None-Match): a 304 costs no download
+            preloaded[key] = { at: Date.now() };
+            preloaded[key].list = fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } })
+                .then(function (r) { return r.ok ? r.json() : { preload: false }; })
+                .then(function (data) {
+                    if (!data || !data.preload) return null;
+                    return (data.results || []).map(function (item) {
+                        return { id: item.id, text: item.text, lower: String(item.text).toLowerCase() };
+                    });
+                })
+                .catch(function () {
+                    delete preloaded[key];
+                    return null;
+                });
+        }
+        return preloaded[key].list;
+    }
+
+    // An object added or changed through the "+"/pencil popups must show up right away
+    function forgetResults() {
+        resultCache.clear();
+        Object.keys(preloaded).forEach(function (key) { delete preloaded[key]; });
+    }
+
+    function wrapPopupDismiss(name) {
+        const original = window[name];
+        if (typeof original !== "function" || original.autogfkWrapped) return;
+        const wrapped = function () {
+            forgetResults();
+            return original.apply(this, arguments);
+        };
+        wrapped.autogfkWrapped = true;
+        window[name] = wrapped;
+    }
+
+    // every word of the term must appear in the label
+    function filterChoices(list, term, page) {
+        const words = String(term || "").toLowerCase().split(/\s+/).filter(Boolean);
+        const matches = words.length
+            ? list.filter(function (item) {
+                return words.every(function (w) { return item.lower.indexOf(w) !== -1; });
+            })
+            : list;
+        const start = ((page || 1) - 1) * LOCAL_PAGE_SIZE;
+        return {
+            results: matches.slice(start, start + LOCAL_PAGE_SIZE).map(function (item) {
+                return { id: item.id, text: item.text };
+            }),
+            more: matches.length > start + LOCAL_PAGE_SIZE,
+        };
+    }
+
+    function isAbort(e) {
+        return !!e && e.name === "AbortError";
+    }
+
+    // superseded requests must not reach Select2; other failures show no results
+    function emptyUnlessAborted(e) {
+        if (isAbort(e)) throw e;
+        return { results: [], more: false };
+    }
+
     // Helper: is this element inside the empty template form?
     function inEmptyForm(el) {
         if (!el) return false;
@@ -22,13 +152,16 @@
         }
         return false;
     }
-    // Initialize a field row (ex.: .form-row) that contains our CT/OBJ pair
-    function initRow(row) {
-        if (!row || row.dataset.autogfkInitialized === "1") return;
+    // Initialize a field row (ex.: .form-row) that contains our CT/OBJ pair.
+    // `trigger` is the select the user clicked ("open") or focused ("focus") to
+    // upgrade the row, so Select2 takes over where the native select was.
+    function initRow(row, trigger, mode) {
+        if (!row || row.dataset.autogfkInitialized === "1" || row.dataset.autogfkInitializing === "1") return;
         if (inEmptyForm(row)) return; // never init the template
         const ct = row.querySelector('select[data-autogfk="ct"]');
         let obj = row.querySelector('select[data-autogfk="obj"]');
         if (!ct || !obj) return; // not our line
+        row.dataset.autogfkInitializing = "1";
 
         const relatedWidgetWrapper = row.querySelector('[data-autogfk-wrapper]');
         const addLink = row.querySelector('a.related-widget-wrapper-link.add-related');
@@ -36,32 +169,83 @@
         const viewLink = row.querySelector('a.related-widget-wrapper-link.view-related');
 
 
-        function fetchOptions(term, page) {
+        // Keyset cursors returned by the server, per (ct, term, page): page N+1 is
+        // requested with the cursor of page N instead of an OFFSET page number
+        let cursors = {};
+
+        function cursorKey(term, page) {
+            return (ct.value || "") + "\u0000" + (term || "") + "\u0000" + String(page || 1);
+        }
+
+        // Search across all allowed content types while none is picked (opt-in);
+        // results are grouped per type and carry "<ct_id>:<pk>" ids
+        const searchUrl = obj.getAttribute("data-autogfk-search-url");
+        let settingCtFromSearch = false;
+
+        function searchAllTypes(term, signal) {
+            const url = new URL(searchUrl, window.location.origin);
+            const cts = Array.prototype.map.call(ct.options, function (o) { return o.value; })
+                .filter(function (v) { return !!v; });
+            if (!cts.length) return Promise.resolve({ results: [], more: false });
+            url.searchParams.set("cts", cts.join(","));
+            if (term) url.searchParams.set("q", term);
+            return getJSON(url, signal)
+                .catch(emptyUnlessAborted);
+        }
+
+        // Small content types come whole from the server once (see AUTOGFK_PRELOAD_THRESHOLD)
+        const choicesUrl = obj.getAttribute("data-autogfk-choices-url");
+
+        function fetchOptions(term, page, signal) {
+            if (!ct.value && searchUrl) return searchAllTypes(term, signal);
+            if (ct.value && choicesUrl) {
+                return loadChoices(choicesUrl, ct.value).then(function (list) {
+                    return list ? filterChoices(list, term, page) : fetchRemote(term, page, signal);
+                });
+            }
+            return fetchRemote(term, page, signal);
+        }
+
+        function fetchRemote(term, page, signal) {
             const base = obj.getAttribute("data-autogfk-url");
             if (!base) return Promise.resolve({ results: [], more: false });
             const url = new URL(base, window.location.origin);
             url.searchParams.set("ct", ct.value || "");
             if (term) url.searchParams.set("q", term);
-            if (page) url.searchParams.set("page", page);
-            return fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } })
-                .then((r) => r.json())
-                .catch(() => ({ results: [], more: false }));
+            if (page && page > 1) {
+                const cursor = cursors[cursorKey(term, page)];
+                if (cursor) url.searchParams.set("cursor", cursor);
+                else url.searchParams.set("page", page);
+            }
+            return getJSON(url, signal)
+                .then(function (data) {
+                    if (data && data.next_cursor) {
+                        cursors[cursorKey(term, (page || 1) + 1)] = data.next_cursor;
+                    }
+                    return data;
+                })
+                .catch(emptyUnlessAborted);
         }
 
-        // Rehydrate CT if the inline template came without options
+        // Rehydrate CT options: the server renders only the selected one and
+        // ships the full list once per page in a shared json_script block
         try {
-            if (ct.options.length <= 1) {
-                const raw = ct.getAttribute("data-autogfk-choices");
-                if (raw) {
-                    const pairs = JSON.parse(raw);
-                    if (Array.isArray(pairs)) {
-                        pairs.forEach(function (p) {
-                            if (!p || p.length < 2) return;
-                            const opt = new Option(String(p[1]), String(p[0]), false, false);
-                            ct.add(opt);
-                        });
-                    }
+            const pairs = readCtMeta(ct).choices;
+            if (Array.isArray(pairs) && pairs.length) {
+                const current = ct.value;
+                const currentLabel = ct.selectedIndex >= 0 ? ct.options[ct.selectedIndex].text : current;
+                Array.prototype.slice.call(ct.options).forEach(function (o) {
+                    if (o.value) ct.remove(o.index);
+                });
+                pairs.forEach(function (p) {
+                    if (!p || p.length < 2) return;
+                    ct.add(new Option(String(p[1]), String(p[0]), false, false));
+                });
+                if (current && !Array.prototype.some.call(ct.options, function (o) { return o.value === current; })) {
+                    // selected CT outside the current limit set: keep it
+                    ct.add(new Option(currentLabel, current, false, false));
                 }
+                ct.value = current;
             }
         } catch (e) { /* silent */ }
 
@@ -107,8 +291,7 @@
 
         function parseCTMap(selectCt) {
             try {
-                const raw = selectCt.getAttribute("data-autogfk-ctmap");
-                const arr = JSON.parse(raw || "[]");
+                const arr = readCtMeta(selectCt).ctmap || [];
                 // create map { "ctId": {app, model} }
                 const map = {};
                 arr.forEach(function (triple) {
@@ -204,10 +387,17 @@
                 // obj: remote Select2, always dependent on CT
                 $obj.select2({
                     ajax: {
+                        // Select2 waits `delay` ms after the last keystroke and calls
+                        // abort() on the request it supersedes
+                        delay: parseInt(obj.getAttribute("data-autogfk-debounce") || "250", 10),
                         transport: function (params, success, failure) {
-                            fetchOptions(params.data && params.data.q, params.data && params.data.page)
+                            const controller = window.AbortController ? new AbortController() : null;
+                            fetchOptions(params.data && params.data.q, params.data && params.data.page, controller && controller.signal)
                                 .then(success)
-                                .catch(failure);
+                                .catch(function (e) {
+                                    if (!isAbort(e)) failure(e);
+                                });
+                            return { abort: function () { if (controller) controller.abort(); } };
                         },
                         processResults: function (data, params) {
                             params.page = params.page || 1;
@@ -220,10 +410,29 @@
 
                 // ct: simple Select2; when changing, clear the object
                 $ct.select2({ width: "style" }).on("change", function () {
-                    $(obj).val(null).trigger("change");
+                    cursors = {};
+                    if (!settingCtFromSearch) $(obj).val(null).trigger("change");
+                    // warm the preloaded list before the object select is opened
+                    if (choicesUrl && ct.value) loadChoices(choicesUrl, ct.value);
                     updateActions();
                 });
 
+                // A cross-type result picks its content type, then the object itself
+                $obj.on("select2:select", function (e) {
+                    const data = e.params && e.params.data;
+                    const id = data && String(data.id || "");
+                    const sep = id.indexOf(":");
+                    if (!searchUrl || sep === -1) return;
+                    settingCtFromSearch = true;
+                    try {
+                        $ct.val(id.slice(0, sep)).trigger("change");
+                    } finally {
+                        settingCtFromSearch = false;
+                    }
+                    const opt = new Option(data.text, id.slice(sep + 1), true, true);
+                    $obj.empty().append(opt).trigger("change");
+                });
+
                 // Update when the object changes (selected via Select2)
                 $obj.on("change", function () {
                     updateActions();
@@ -245,17 +454,62 @@
 
                 // only mark initialized after successful init
                 row.dataset.autogfkInitialized = "1";
+                delete row.dataset.autogfkInitializing;
+
+                // hand the interaction that triggered the upgrade over to Select2
+                if (trigger) {
+                    const $trigger = $(trigger);
+                    if (mode === "open") {
+                        $trigger.select2("open");
+                    } else {
+                        const instance = $trigger.data("select2");
+                        if (instance && instance.$selection) instance.$selection.trigger("focus");
+                    }
+                }
             }, 0);
         });
     }
 
+    // Rows are upgraded to Select2 lazily: when they come near the viewport or on
+    // first click/focus, whichever happens first. Until then they are plain selects.
+    const observer = ("IntersectionObserver" in window)
+        ? new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (!entry.isIntersecting) return;
+                observer.unobserve(entry.target);
+                initRow(entry.target);
+            });
+        }, { rootMargin: "200px 0px" })
+        : null;
+
+    function watchRow(row) {
+        if (row.dataset.autogfkWatched === "1" || row.dataset.autogfkInitialized === "1") return;
+        row.dataset.autogfkWatched = "1";
+
+        function onFirstUse(e) {
+            const target = e.target;
+            if (!target || !target.matches || !target.matches("select[data-autogfk]")) return;
+            row.removeEventListener("mousedown", onFirstUse, true);
+            row.removeEventListener("focusin", onFirstUse, true);
+            if (observer) observer.unobserve(row);
+            // open Select2 instead of the native list
+            if (e.type === "mousedown") e.preventDefault();
+            initRow(row, target, e.type === "mousedown" ? "open" : "focus");
+        }
+        row.addEventListener("mousedown", onFirstUse, true);
+        row.addEventListener("focusin", onFirstUse, true);
+
+        if (observer) observer.observe(row);
+        else initRow(row);
+    }
+
     function initAllIn(root) {
         const scope = root || document;
         // Search lines that contain explicitly our marked selects
         const rows = scope.querySelectorAll('.form-row, .form-group, .fieldBox, .inline-related .form-row');
         rows.forEach(function (row) {
             if (!inEmptyForm(row) && row.querySelector('select[data-autogfk="obj"]')) {
-                initRow(row);
+                watchRow(row);
             }
         });
     }
@@ -275,6 +529,9 @@
 
         initAllIn(document);
 
+        // defined by the admin's RelatedObjectLookups.js
+        wrapPopupDismiss("dismissAddRelatedObjectPopup");
+        wrapPopupDismiss("dismissChangeRelatedObjectPopup");
     });
 
 })();
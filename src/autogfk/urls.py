@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import autocomplete
+from .views import autocomplete, autocomplete_async, choices, labels, search
 
 app_name = "autogfk"
 
 urlpatterns = [
     path("autocomplete/", autocomplete, name="autocomplete"),
+    path("autocomplete/async/", autocomplete_async, name="autocomplete_async"),
+    path("labels/", labels, name="labels"),
+    path("search/", search, name="search"),
+    path("choices/", choices, name="choices"),
 ]
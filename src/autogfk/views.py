@@ -1,11 +1,318 @@
 from __future__ import annotations
+import base64
+import hashlib
+import json
+import threading
+import time
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
 from django.http import JsonResponse, Http404
+from django.shortcuts import resolve_url
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.text import capfirst
+from .autocomplete import (
+    label_fields, label_queryset, preload_threshold, rank_columns, render_label, search_queryset,
+)
+from .contenttypes import aget_content_type, get_content_type, gfk_target_models
+from .resolver import resolve_labels
 
 PAGE_SIZE = 30
+# Max (ct, oid) pairs per request to the labels endpoint
+MAX_LABEL_PAIRS = 500
+# Search across content types: max types per request and results per type
+MAX_SEARCH_TYPES = 20
+SEARCH_PER_TYPE = 10
+
+# Opt-in result cache: AUTOGFK_AUTOCOMPLETE_CACHE = {"ALIAS": "default", "TIMEOUT": 60}
+CACHE_KEY_PREFIX = "autogfk:ac"
+DEFAULT_CACHE_TIMEOUT = 60
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def _encode_cursor(data) -> str:
+    raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        raise Http404("Invalid cursor")
+    if not isinstance(data, dict):
+        raise Http404("Invalid cursor")
+    return data
+
+
+def _keyset_ordering(model, ordering):
+    """
+    Returns [(field_name, attname, descending)] ending with the pk when the
+    ordering can drive a keyset cursor (plain, non-null local fields), else None.
+    Relations are rejected: order_by("fk") sorts by the related model's
+    ordering, which a filter on the fk value can't follow.
+    """
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str) or item == "?" or "__" in item:
+            return None
+        desc = item.startswith("-")
+        name = item.lstrip("-")
+        field = model._meta.pk if name == "pk" else None
+        if field is None:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+        if getattr(field, "null", True) or not getattr(field, "concrete", False) or field.is_relation:
+            return None
+        keys.append((field.name, field.attname, desc))
+    if not any(name == model._meta.pk.name for name, _, _ in keys):
+        keys.append((model._meta.pk.name, model._meta.pk.attname, False))
+    return keys
+
+
+def _paginate(qs, keys, cursor=None, page=None):
+    """
+    Slices PAGE_SIZE + 1 rows to compute `more` without a COUNT(*).
+    With keyset ordering `keys` (see _keyset_ordering), the cursor carries the
+    last row's ordering values ({"k": [...]}); otherwise it carries an offset
+    ({"o": n}). Rows may be instances or values() dicts.
+    Returns (rows, more, next_cursor).
+    """
+    qs, offset = _page_queryset(qs, keys, cursor, page)
+    return _page_result(list(qs), keys, offset)
+
+
+def _page_queryset(qs, keys, cursor=None, page=None):
+    """
+    The unevaluated PAGE_SIZE + 1 slice of _paginate(). Returns (qs, offset).
+    """
+    offset = 0
+    if cursor:
+        data = _decode_cursor(cursor)
+        if "k" in data and keys and len(data["k"]) == len(keys):
+            # (a > x) OR (a = x AND b > y) OR ... ; "<" for descending columns
+            after = Q()
+            equal = {}
+            for (name, _, desc), value in zip(keys, data["k"]):
+                after |= Q(**equal, **{f"{name}__{'lt' if desc else 'gt'}": value})
+                equal[name] = value
+            qs = qs.filter(after)
+        else:
+            try:
+                offset = max(int(data.get("o", 0)), 0)
+            except (TypeError, ValueError):
+                raise Http404("Invalid cursor")
+    elif page:
+        try:
+            offset = max(int(page) - 1, 0) * PAGE_SIZE
+        except (TypeError, ValueError):
+            raise Http404("Invalid page")
+
+    if keys:
+        qs = qs.order_by(*[f"{'-' if desc else ''}{name}" for name, _, desc in keys])
+    return qs[offset:offset + PAGE_SIZE + 1], offset
+
+
+def _page_result(rows, keys, offset):
+    more = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+    next_cursor = None
+    if more:
+        if keys:
+            last = rows[-1]
+            values = [last[attname] if isinstance(last, dict) else getattr(last, attname) for _, attname, _ in keys]
+            next_cursor = _encode_cursor({"k": values})
+        else:
+            next_cursor = _encode_cursor({"o": offset + PAGE_SIZE})
+    return rows, more, next_cursor
+
+
+def _cache_config():
+    """
+    Returns (cache, timeout) when AUTOGFK_AUTOCOMPLETE_CACHE is set, else None.
+    The setting is True (default cache, DEFAULT_CACHE_TIMEOUT) or a dict with
+    optional "ALIAS" and "TIMEOUT".
+    """
+    conf = getattr(settings, "AUTOGFK_AUTOCOMPLETE_CACHE", None)
+    if not conf:
+        return None
+    if conf is True:
+        conf = {}
+    return caches[conf.get("ALIAS", "default")], conf.get("TIMEOUT", DEFAULT_CACHE_TIMEOUT)
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cache_stats() -> dict:
+    """
+    Hit/miss/invalidation counters of the autocomplete cache (this process only).
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats() -> None:
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+def _generation(cache, ct_id) -> int:
+    key = f"{CACHE_KEY_PREFIX}:gen:{ct_id}"
+    gen = cache.get(key)
+    if gen is None:
+        # start from a timestamp so an evicted counter never reuses an old generation
+        cache.add(key, int(time.time() * 1000), None)
+        gen = cache.get(key)
+    return gen
+
+
+def _bump_generation(cache, ct_id) -> None:
+    key = f"{CACHE_KEY_PREFIX}:gen:{ct_id}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def _user_scope(request) -> str:
+    # querysets may depend on the user (ModelAdmin.get_queryset, register(queryset=...)),
+    # superuser or not, so every user gets their own entries
+    return f"u{request.user.pk}"
+
+
+def _cache_key(cache, ct_id, request, q: str) -> str:
+    params = json.dumps([
+        q,
+        request.GET.get("cursor") or "",
+        request.GET.get("page") or "",
+    ])
+    digest = hashlib.md5(params.encode(), usedforsecurity=False).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{ct_id}:{_generation(cache, ct_id)}:{_user_scope(request)}:{digest}"
+
+
+def _cache_lookup(request, ct_id, q):
+    """
+    Returns (cache key, cached response data); (None, None) when the cache is off.
+    """
+    conf = _cache_config()
+    if conf is None:
+        return None, None
+    key = _cache_key(conf[0], ct_id, request, q)
+    data = conf[0].get(key)
+    _count("hits" if data is not None else "misses")
+    return key, data
+
+
+def _cache_store(key, data) -> None:
+    conf = _cache_config()
+    if key is not None and conf is not None:
+        conf[0].set(key, data, conf[1])
+
+
+def invalidate_cache(model) -> None:
+    """
+    Drops the cached autocomplete results of `model` by bumping its generation.
+    """
+    conf = _cache_config()
+    if conf is None:
+        return
+    cache = conf[0]
+    cts = {
+        ContentType.objects.get_for_model(model, for_concrete_model=False).pk,
+        get_content_type(model).pk,
+    }
+    for ct_id in cts:
+        _bump_generation(cache, ct_id)
+    _count("invalidations")
+
+
+def _invalidated_by(sender, targets):
+    """
+    Served models whose cached results a write to `sender` makes stale: the
+    sender and its multi-table parents (their rows change too), restricted to
+    `targets` (see gfk_target_models(); None: every model).
+    """
+    if sender._meta.auto_created:
+        return []
+    return [
+        model for model in (sender, *sender._meta.get_parent_list())
+        if targets is None or model in targets or model._meta.concrete_model in targets
+    ]
+
+
+def _on_model_change(sender, **kwargs):
+    if _cache_config() is None:
+        return
+    # writes to models no GFK points to cost a set lookup
+    for model in _invalidated_by(sender, gfk_target_models()):
+        invalidate_cache(model)
+
+
+post_save.connect(_on_model_change, dispatch_uid="autogfk.views.cache.post_save")
+post_delete.connect(_on_model_change, dispatch_uid="autogfk.views.cache.post_delete")
+
+
+def _labelled_queryset(request, model, q):
+    """
+    Searched, ordered queryset of `model` restricted to its label columns.
+    Returns (qs, keyset ordering or None).
+    """
+    qs = search_queryset(request, model, q)
+    ordering = list(getattr(model._meta, "ordering", None) or ["pk"])
+    qs = qs.order_by(*ordering)
+    keys = _keyset_ordering(model, ordering)
+    # only pk + label columns (+ keyset columns for the cursor) when a label spec is registered
+    return label_queryset(model, qs, extra_fields=[attname for _, attname, _ in keys or ()]), keys
+
+
+def _results(model, rows):
+    pk_attname = model._meta.pk.attname
+    return [
+        {"id": row[pk_attname] if isinstance(row, dict) else row.pk, "text": render_label(model, row)}
+        for row in rows
+    ]
+
+
+# annotation holding the search rank of a row (0 best)
+RANK_ALIAS = "_autogfk_rank"
+
+
+def _ranked(request, model, qs, q):
+    """
+    Orders `qs` by match quality before the existing ordering: exact (0) >
+    prefix (1) > contains (2) on any rank_columns(), else 3. Done in SQL so
+    the best matches survive the slice.
+    """
+    columns = rank_columns(request, model)
+    if not q or not columns:
+        return qs.annotate(**{RANK_ALIAS: Value(3)})
+    whens = [
+        When(**{f"{column}__{lookup}": q}, then=Value(rank))
+        for rank, lookup in enumerate(("iexact", "istartswith", "icontains"))
+        for column in columns
+    ]
+    rank = Case(*whens, default=Value(3), output_field=IntegerField())
+    return qs.annotate(**{RANK_ALIAS: rank}).order_by(RANK_ALIAS, *qs.query.order_by)
+
 
 @staff_member_required
 def autocomplete(request):
@@ -13,8 +320,8 @@ def autocomplete(request):
     if not ct_id:
         raise Http404("Missing content type")
     try:
-        ct = ContentType.objects.get(pk=ct_id)
-    except ContentType.DoesNotExist:
+        ct = get_content_type(int(ct_id))
+    except (ContentType.DoesNotExist, ValueError):
         raise Http404("Invalid content type")
 
     model = ct.model_class()
@@ -22,37 +329,177 @@ def autocomplete(request):
         return JsonResponse({"results": [], "more": False})
 
     q = request.GET.get("q", "")
-    qs = model._default_manager.all()
-
-    search_fields = []
-    for field_name in ("name", "title", "username", "email", "slug", "id"):
-        if hasattr(model, field_name):
-            search_fields.append(field_name)
-    if q and search_fields:
-        filt = Q()
-        for f in search_fields:
-            if f == "id" and q.isdigit():
-                filt |= Q(**{f: int(q)})
-            else:
-                filt |= Q(**{f"{f}__icontains": q})
-        qs = qs.filter(filt)
+    key, data = _cache_lookup(request, ct.pk, q)
+    if data is not None:
+        return JsonResponse(data)
 
-    if getattr(model._meta, "ordering", None):
-        qs = qs.order_by(*model._meta.ordering)
-    else:
-        qs = qs.order_by("pk")
+    qs, keys = _labelled_queryset(request, model, q)
+    rows, more, next_cursor = _paginate(
+        qs, keys, cursor=request.GET.get("cursor"), page=request.GET.get("page"),
+    )
 
-    paginator = Paginator(qs, PAGE_SIZE)
-    page_number = int(request.GET.get("page", 1))
-    page = paginator.get_page(page_number)
+    data = {"results": _results(model, rows), "more": more, "next_cursor": next_cursor}
+    _cache_store(key, data)
+    return JsonResponse(data)
 
-    def label(obj):
-        if hasattr(obj, "__str__"):
-            return str(obj)
-        return f"{model.__name__} #{obj.pk}"
 
-    data = {
-        "results": [{"id": obj.pk, "text": label(obj)} for obj in page.object_list],
-        "more": page.has_next(),
-    }
+async def _auser(request):
+    if hasattr(request, "auser"):  # Django >= 5.0
+        return await request.auser()
+
+    def load():
+        request.user.is_active  # evaluates the lazy user
+        return request.user
+    return await sync_to_async(load)()
+
+
+def _async_staff_member_required(view):
+    """
+    staff_member_required for async views (user_passes_test is sync-only before Django 5.1).
+    """
+    @wraps(view)
+    async def _wrapped(request, *args, **kwargs):
+        user = await _auser(request)
+        if user.is_active and user.is_staff:
+            # already loaded: the sync parts run in a thread must not query it again
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path(), resolve_url("admin:login"), REDIRECT_FIELD_NAME)
+    return _wrapped
+
+
+@_async_staff_member_required
+async def autocomplete_async(request):
+    """
+    Async autocomplete for ASGI deployments; same parameters and response as
+    autocomplete(). Queries run on the async ORM; the queryset hooks
+    (ModelAdmin.get_queryset, register(queryset=...)), the cache and
+    instance labels (str(obj)) run through sync_to_async.
+    """
+    ct_id = request.GET.get("ct")
+    if not ct_id:
+        raise Http404("Missing content type")
+    try:
+        ct = await aget_content_type(int(ct_id))
+    except (ContentType.DoesNotExist, ValueError):
+        raise Http404("Invalid content type")
+
+    model = ct.model_class()
+    if model is None:
+        return JsonResponse({"results": [], "more": False})
+
+    q = request.GET.get("q", "")
+    key, data = await sync_to_async(_cache_lookup)(request, ct.pk, q)
+    if data is not None:
+        return JsonResponse(data)
+
+    qs, keys = await sync_to_async(_labelled_queryset)(request, model, q)
+    qs, offset = _page_queryset(qs, keys, cursor=request.GET.get("cursor"), page=request.GET.get("page"))
+    rows, more, next_cursor = _page_result([row async for row in qs], keys, offset)
+
+    if label_fields(model) is None:
+        results = await sync_to_async(_results)(model, rows)
+    else:
+        results = _results(model, rows)
+    data = {"results": results, "more": more, "next_cursor": next_cursor}
+    await sync_to_async(_cache_store)(key, data)
     return JsonResponse(data)
+
+
+@staff_member_required
+def labels(request):
+    """
+    Resolves many objects at once: ?pair=<ct_id>:<oid>&pair=... ->
+    {"results": [{"ct", "id", "text", "change_url"}]} (one query per content type).
+    """
+    raw = request.GET.getlist("pair")
+    if len(raw) > MAX_LABEL_PAIRS:
+        raise Http404("Too many pairs")
+    pairs = []
+    for item in raw:
+        ct_id, sep, oid = item.partition(":")
+        if not sep:
+            raise Http404("Invalid pair")
+        pairs.append((ct_id, oid))
+
+    resolved = resolve_labels(pairs, request=request)
+    return JsonResponse({
+        "results": [{"ct": ct_id, **info} for (ct_id, _), info in resolved.items()],
+    })
+
+
+@staff_member_required
+def search(request):
+    """
+    Searches several content types at once: ?cts=<id>,<id>&q=... ->
+    grouped Select2 results whose ids are "<ct_id>:<pk>". Each type returns its
+    SEARCH_PER_TYPE best rows, ranked exact > prefix > contains in SQL (see
+    _ranked()); groups are ordered by their best match.
+    """
+    ct_ids = [c for c in request.GET.get("cts", "").split(",") if c]
+    if not ct_ids:
+        raise Http404("Missing content types")
+    if len(ct_ids) > MAX_SEARCH_TYPES:
+        raise Http404("Too many content types")
+
+    q = request.GET.get("q", "").strip()
+    groups = []
+    for ct_id in dict.fromkeys(ct_ids):
+        try:
+            ct = get_content_type(int(ct_id))
+        except (ContentType.DoesNotExist, ValueError):
+            raise Http404("Invalid content type")
+        model = ct.model_class()
+        if model is None:
+            continue
+        qs, _ = _labelled_queryset(request, model, q)
+        pk_attname = model._meta.pk.attname
+        children = []
+        for row in _ranked(request, model, qs, q)[:SEARCH_PER_TYPE]:
+            if isinstance(row, dict):
+                rank, pk = row.pop(RANK_ALIAS), row[pk_attname]
+            else:
+                rank, pk = getattr(row, RANK_ALIAS), row.pk
+            children.append((rank, {"id": f"{ct.pk}:{pk}", "text": render_label(model, row)}))
+        if not children:
+            continue
+        groups.append((children[0][0], {
+            "text": str(capfirst(model._meta.verbose_name_plural)),
+            "children": [child for _, child in children],
+        }))
+
+    groups.sort(key=lambda g: g[0])
+    return JsonResponse({"results": [group for _, group in groups], "more": False})
+
+
+@staff_member_required
+def choices(request):
+    """
+    Whole (id, text) list of a small content type, filtered in the browser:
+    {"preload": true, "results": [...]} when it has at most preload_threshold()
+    rows, else {"preload": false} (keep using autocomplete). Carries an ETag so
+    the browser revalidates instead of downloading it again.
+    """
+    ct_id = request.GET.get("ct")
+    if not ct_id:
+        raise Http404("Missing content type")
+    try:
+        ct = get_content_type(int(ct_id))
+    except (ContentType.DoesNotExist, ValueError):
+        raise Http404("Invalid content type")
+
+    model = ct.model_class()
+    threshold = preload_threshold(model) if model is not None else 0
+    data = {"preload": False}
+    if threshold:
+        qs, _ = _labelled_queryset(request, model, "")
+        # one extra row tells "too big" apart without a COUNT(*)
+        rows = list(qs[:threshold + 1])
+        if len(rows) <= threshold:
+            data = {"preload": True, "results": _results(model, rows)}
+
+    response = JsonResponse(data)
+    response["ETag"] = etag = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    patch_cache_control(response, private=True, no_cache=True)
+    # 304 when If-None-Match matches
+    return get_conditional_response(request, etag=etag, response=response)
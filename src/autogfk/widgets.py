@@ -4,17 +4,30 @@ from django import forms
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import EmptyResultSet
+import copy
+import hashlib
 import json
+from .autocomplete import preload_enabled
+from .contenttypes import get_content_type, get_model
+from .resolver import admin_urls, pair_key, resolve_labels
+
 class AutoGenericForeignKeyWidget(forms.MultiWidget):
 
     template_name = "autogfk/widgets/autogfk.html"
 
-    def __init__(self, model_admin, admin_site, *, request=None, limit_ct_qs=None, show_app_label=True, attrs=None):
+    def __init__(self, model_admin, admin_site, *, request=None, limit_ct_qs=None, show_app_label=True,
+                 search_all_content_types=False, attrs=None):
         self.admin_site = admin_site
         self.model_admin = model_admin
+        # set per form instance by the admin mixins (widgets of cached form
+        # classes are built without one); permissions and memos follow it
         self.request = request
         self.limit_ct_qs = limit_ct_qs
         self.show_app_label = show_app_label
+        # pair_key(ct, oid) -> resolve_labels() entry, used without a request; with
+        # one, the map lives on the request (see _resolved_map)
+        self.resolved = {}
 
         # Subwidgets “base”: dois Selects, com nossos data-attrs
         ct_widget = forms.Select(attrs={
@@ -25,23 +38,104 @@ class AutoGenericForeignKeyWidget(forms.MultiWidget):
         obj_widget = forms.Select(attrs={
             "class": "autogfk-select autogfk-object-id",
             "data-autogfk": "obj",
-            "data-autogfk-url": reverse("autogfk:autocomplete"),
+            # AUTOGFK_ASYNC_AUTOCOMPLETE: use the async view (for ASGI deployments)
+            "data-autogfk-url": reverse(
+                "autogfk:autocomplete_async" if getattr(settings, "AUTOGFK_ASYNC_AUTOCOMPLETE", False)
+                else "autogfk:autocomplete"
+            ),
             "data-autogfk-admin-root": reverse("admin:index"),
+            # ms to wait after the last keystroke before querying
+            "data-autogfk-debounce": str(getattr(settings, "AUTOGFK_AUTOCOMPLETE_DEBOUNCE", 250)),
         })
 
+        if preload_enabled():
+            # small content types are fetched whole once and filtered in the browser
+            obj_widget.attrs["data-autogfk-choices-url"] = reverse("autogfk:choices")
+
+        if search_all_content_types:
+            # with no content type picked, the object select searches all allowed types
+            obj_widget.attrs["data-autogfk-search-url"] = reverse("autogfk:search")
+
         super().__init__([ct_widget, obj_widget], attrs)
 
-        # Choices e metadados do CT (id→label e id→(app, model)) vão em data-attrs do select de CT
-        qs = limit_ct_qs if limit_ct_qs is not None else ContentType.objects.all()
+    def __deepcopy__(self, memo):
+        obj = super().__deepcopy__(memo)
+        # each form instance resolves its own labels (see _resolved_map)
+        obj.resolved = {}
+        return obj
+
+    def _resolved_map(self):
+        # one map per request, shared by every widget of the page
+        memo = self._request_memo()
+        return memo.setdefault("resolved", {}) if memo is not None else self.resolved
+
+    def _request_memo(self):
+        """
+        Dict stored on the current request: shared by every widget rendered for
+        it and released with it. None without a request.
+        """
+        request = self.request
+        if request is None:
+            return None
+        memo = getattr(request, "_autogfk_memo", None)
+        if memo is None:
+            memo = request._autogfk_memo = {}
+        return memo
+
+    def _ct_metadata(self):
+        """
+        Returns (choices, json_script id, {"choices", "ctmap"}) for the allowed
+        content types, computed at render time once per (request, limit set):
+        choices and permission flags always reflect the current user.
+        """
+        # fresh queryset: the widget may outlive many requests (cached form classes)
+        qs = (self.limit_ct_qs if self.limit_ct_qs is not None else ContentType.objects).all()
+        memo = self._request_memo()
+        key = None
+        if memo is not None:
+            try:
+                sql = str(qs.query)
+            except EmptyResultSet:
+                sql = None
+            key = ("ct_metadata", sql, self.show_app_label)
+            if key in memo:
+                return memo[key]
+            # rows are shared by widgets with other labels (show_app_label) on the page
+            cts = memo.get(("ct_rows", sql))
+            if cts is None:
+                cts = memo[("ct_rows", sql)] = list(qs)
+        else:
+            cts = list(qs)
         # Ensure labels are plain strings (avoid lazy translation proxies)
-        ct_pairs = [(ct.pk, str(self._ct_label(ct))) for ct in qs]
-        self.widgets[0].choices = [("", "---------")] + ct_pairs
-        self.widgets[0].attrs["data-autogfk-choices"] = json.dumps(ct_pairs)
-        # Include permission flags (add/change/view) for the current user per CT
-        self.widgets[0].attrs["data-autogfk-ctmap"] = json.dumps([
-            [ct.pk, ct.app_label, ct.model, self._ct_perms(ct)] for ct in qs
-        ])
+        ct_pairs = [(ct.pk, str(self._ct_label(ct))) for ct in cts]
+        ctmap = [[ct.pk, ct.app_label, ct.model, self._ct_perms_memoized(ct)] for ct in cts]
+        meta = {"choices": ct_pairs, "ctmap": ctmap}
+        digest = hashlib.md5(json.dumps(meta).encode(), usedforsecurity=False).hexdigest()[:12]
+        result = (ct_pairs, f"autogfk-ct-{digest}", meta)
+        if key is not None:
+            memo[key] = result
+        return result
+
+    def _ct_meta_once(self, ct_meta_id, ct_meta):
+        # the json_script block is emitted by the first widget of the request using it
+        memo = self._request_memo()
+        if memo is None:
+            return ct_meta
+        emitted = memo.setdefault("ct_meta_emitted", set())
+        if ct_meta_id in emitted:
+            return None
+        emitted.add(ct_meta_id)
+        return ct_meta
 
+    def _ct_perms_memoized(self, ct):
+        # permission flags depend only on the user: one check per content type per request
+        memo = self._request_memo()
+        if memo is None:
+            return self._ct_perms(ct)
+        key = ("ct_perms", ct.pk)
+        if key not in memo:
+            memo[key] = self._ct_perms(ct)
+        return memo[key]
 
     def _ct_perms(self, ct):
         """
@@ -107,6 +201,38 @@ class AutoGenericForeignKeyWidget(forms.MultiWidget):
             return str(label)
 
 
+    def prime(self, values):
+        """
+        Resolves the labels of many widget values ((ct_id, obj_id) or dicts)
+        with one query per content type, ahead of rendering.
+        """
+        resolved = self._resolved_map()
+        missing = {}
+        for ct_id, obj_id in (self.decompress(v) for v in values):
+            if not (ct_id and obj_id):
+                continue
+            try:
+                key = pair_key(ct_id, obj_id)
+            except (TypeError, ValueError):
+                continue  # invalid posted value: rendered without a label
+            if key not in resolved:
+                missing[key] = (ct_id, obj_id)
+        if missing:
+            resolved.update(resolve_labels(missing.values(), admin_site=self.admin_site))
+            # remember misses too, so get_context() doesn't query them again
+            for key in missing:
+                resolved.setdefault(key, None)
+
+    def defer_prime(self, values):
+        """
+        Queues values for prime(): the first widget rendered for the request
+        resolves them all at once, and nothing is queried when none renders
+        (e.g. a POST that saves and redirects). Without a request, no-op.
+        """
+        memo = self._request_memo()
+        if memo is not None:
+            memo.setdefault("pending", []).extend(values)
+
     def decompress(self, value):
         # value can come as (ct_id, obj_id) OR dict {"content_type": <CT|id>, "object_id": id}
         if not value:
@@ -130,26 +256,42 @@ class AutoGenericForeignKeyWidget(forms.MultiWidget):
         no objeto quando (ct_id, obj_id) existem.
         """
         ct_id, obj_id = self.decompress(value)
+        # choices + (app, model, add/change/view perms) per CT live in one json_script
+        # block per page and limit set; autogfk.js fills the select from it
+        ct_pairs, ct_meta_id, ct_meta = self._ct_metadata()
 
-        # Garante que o CT atual (se existir) está nas choices (caso o filtro tenha mudado)
-        if ct_id and all(str(ct_id) != str(v) for v, _ in self.widgets[0].choices):
-            try:
-                ct = ContentType.objects.get(pk=ct_id)
-                self.widgets[0].choices = list(self.widgets[0].choices) + [(ct.pk, self._ct_label(ct))]
-            except ContentType.DoesNotExist:
-                pass
+        # Only the selected CT is rendered as an option; the rest come from the shared block
+        ct_choices = [("", "---------")]
+        if ct_id:
+            selected = [(v, label) for v, label in ct_pairs if str(v) == str(ct_id)]
+            if not selected:
+                # the current CT may be outside the filter (e.g. limit_choices_to changed)
+                try:
+                    ct = get_content_type(ct_id)
+                    selected = [(ct.pk, self._ct_label(ct))]
+                except (ContentType.DoesNotExist, ValueError):
+                    pass
+            ct_choices += selected
+        ct_widget = copy.copy(self.widgets[0])
+        ct_widget.choices = ct_choices
+        ct_widget.attrs = {**ct_widget.attrs, "data-autogfk-ct-meta": ct_meta_id}
 
-        obj = None
+        # values queued by the admin mixins (defer_prime) resolve together, on the first render
+        memo = self._request_memo()
+        pending = memo.pop("pending", None) if memo is not None else None
+        if pending:
+            self.prime(pending)
+
+        resolved = None
         # Pré-carrega a option do objeto selecionado (para Select2 mostrar label)
         if ct_id and obj_id:
             try:
-                model = ContentType.objects.get(pk=ct_id).model_class()
-                if model is not None:
-                    obj = model._default_manager.filter(pk=obj_id).first()
-                    if obj is not None:
-                        self.widgets[1].choices = [(obj.pk, str(obj))]
-            except Exception:
-                pass
+                self.prime([(ct_id, obj_id)])
+                resolved = self._resolved_map().get(pair_key(ct_id, obj_id))
+            except (ContentType.DoesNotExist, ValueError):
+                resolved = None
+            if resolved is not None:
+                self.widgets[1].choices = [(resolved["id"], resolved["text"])]
 
         # Ids/names dos subwidgets
         attrs = attrs or {}
@@ -161,7 +303,7 @@ class AutoGenericForeignKeyWidget(forms.MultiWidget):
             attrs_obj["id"] = f"{base_id}_1"
 
         # Contextos individuais dos subwidgets (usam select.html do Django)
-        ct_ctx = self.widgets[0].get_context(f"{name}_0", ct_id, attrs_ct)
+        ct_ctx = ct_widget.get_context(f"{name}_0", ct_id, attrs_ct)
         obj_ctx = self.widgets[1].get_context(f"{name}_1", obj_id, attrs_obj)
 
         ctx = super().get_context(name, value, attrs)
@@ -170,12 +312,15 @@ class AutoGenericForeignKeyWidget(forms.MultiWidget):
         # Opcional: flags auxiliares que o template pode usar
         ctx["widget"]["has_initial_ct"] = bool(ct_id)
         ctx["widget"]["has_initial_obj"] = bool(ct_id and obj_id)
+        ctx["widget"]["ct_meta_id"] = ct_meta_id
+        ctx["widget"]["ct_meta"] = self._ct_meta_once(ct_meta_id, ct_meta)
 
-        if bool(ct_id and obj_id):
-            ctx["widget"]["data_href_template"] = f'/admin/{obj._meta.app_label}/{obj._meta.model_name}/__fk__/change/?_to_field=id&_popup=1'
-            ctx["widget"]["change_href"] = f'/admin/{obj._meta.app_label}/{obj._meta.model_name}/{obj.pk}/change/?_to_field=id&_popup=1'
-            ctx["widget"]["view_href"] = f'/admin/{obj._meta.app_label}/{obj._meta.model_name}/{obj.pk}/change/?_to_field=id&_popup=1'
-            ctx["widget"]["add_href"] = f'/admin/{obj._meta.app_label}/{obj._meta.model_name}/add/?_to_field=id&_popup=1'
+        if resolved is not None:
+            urls = admin_urls(get_model(ct_id), self.admin_site)
+            ctx["widget"]["data_href_template"] = urls["change_template"]
+            ctx["widget"]["change_href"] = resolved["change_url"]
+            ctx["widget"]["view_href"] = resolved["change_url"]
+            ctx["widget"]["add_href"] = urls["add"]
         return ctx
 
     @property
@@ -0,0 +1,38 @@
+import pytest
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from tests.testapp.models import Comment, PolyComment, Bookmark, Document
+
+@pytest.mark.django_db
+def test_edges(django_assert_num_queries):
+    u = User.objects.create_user("a"); g = Group.objects.create(name="g")
+    c1 = Comment.objects.create(owner=u); c2 = Comment.objects.create(owner=g); c3 = Comment.objects.create(owner=None)
+    uct = ContentType.objects.get_for_model(User)
+    print("empty in", Comment.objects.filter(owner__in=[]).count())
+    print("none qs", Comment.objects.filter(owner__in=User.objects.none()).count())
+    print("gen", Comment.objects.filter(owner__in=(x for x in [u, g])).count())
+    print("tuple", Comment.objects.filter(owner__in=[(uct.pk, u.pk)]).count())
+    print("pk", Comment.objects.filter(owner__pk=u.pk).count())
+    print("type__in empty", Comment.objects.filter(owner__type__in=[]).count())
+    print("exclude isnull", Comment.objects.exclude(owner__isnull=True).count())
+    print("Q or exact", Comment.objects.filter(Q(owner=u) | Q(owner=g)).count())
+    print("get_or_create", Comment.objects.get_or_create(owner=u)[1])
+    print("iterator prefetch")
+    rows = list(Comment.objects.prefetch_gfk("owner").iterator())
+    print("values", list(Comment.objects.prefetch_gfk("owner").values_list("pk", flat=True))[:2])
+    print("order", [c.pk for c in Comment.objects.order_by("-owner__type")])
+    # stale cache sync bug
+    c = Comment.objects.get(pk=c1.pk); c.owner  # cache u
+    c.owner_content_type = ContentType.objects.get_for_model(Group); c.owner_object_id = g.pk
+    Comment.objects.bulk_update([c], fields=["owner_content_type", "owner_object_id"])
+    print("direct col update ok:", Comment.objects.get(pk=c1.pk).owner)
+    c = Comment.objects.get(pk=c1.pk); c.owner
+    c.owner_content_type = uct; c.owner_object_id = u.pk
+    Comment.objects.bulk_update([c], fields=["owner", "body"])
+    print("logical update after direct cols:", Comment.objects.get(pk=c1.pk).owner)
+    # bulk_create with cached target of a copy
+    c = Comment.objects.get(pk=c2.pk); c.owner
+    c.pk = None; c.owner_content_type = uct; c.owner_object_id = u.pk
+    Comment.objects.bulk_create([c])
+    print("bulk_create copy target:", Comment.objects.get(pk=c.pk).owner)
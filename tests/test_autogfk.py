@@ -1,9 +1,25 @@
+import json
+import re
 import pytest
 from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
-from django.contrib.auth.models import User
-from django.test import Client
-from tests.testapp.models import IntelligenceCredentials
+from django.contrib.auth.models import Group, Permission, User
+from django.db import IntegrityError, connection, models, transaction
+from django.db.migrations.state import ModelState
+from django.db.models import Q
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from autogfk.registry import get_gfk_map, get_gfk_specs, get_save_checked_pairs, iter_gfk_specs
+from autogfk import autocomplete as autocomplete_config
+from autogfk import views as autogfk_views
+from autogfk.contenttypes import get_content_type, warm_up
+from autogfk.forms import AutoGenericForeignKeyFormField
+from autogfk.resolver import resolve_labels
+from autogfk.widgets import AutoGenericForeignKeyWidget
+from tests.testapp.models import (
+    Bookmark, Comment, Document, Folder, FolderItem, IntelligenceCredentials, Note, PolyComment, PolyReply, Tag,
+)
 
 @pytest.mark.django_db
 def test_autocreate_fields():
@@ -21,3 +37,644 @@ def test_autocomplete_view(admin_client):
     assert resp.status_code == 200
     data = resp.json()
     assert "results" in data and len(data["results"]) >= 1
+
+@pytest.mark.django_db
+def test_gfk_in_groups_ids_per_content_type(django_assert_num_queries):
+    users = [User.objects.create_user(username=f"u{i}") for i in range(3)]
+    group = Group.objects.create(name="g")
+    for target in users + [group]:
+        Comment.objects.create(owner=target)
+    Comment.objects.create(owner=None)
+
+    ContentType.objects.get_for_models(User, Group)  # warm the manager cache
+    with django_assert_num_queries(0):
+        qs = Comment.objects.filter(owner__in=users[:2] + [group])
+    sql = str(qs.query)
+    assert sql.count(" IN (") == 1
+    assert qs.count() == 3
+    assert Comment.objects.filter(Q(owner__in=users) | Q(owner=None)).count() == 4
+    assert Comment.objects.exclude(owner__in=users).count() == 2
+
+@pytest.mark.django_db
+def test_gfk_in_accepts_querysets_as_subqueries(django_assert_num_queries):
+    active = User.objects.create_user(username="active")
+    inactive = User.objects.create_user(username="inactive", is_active=False)
+    group = Group.objects.create(name="g")
+    for target in (active, inactive, group):
+        Comment.objects.create(owner=target)
+
+    ContentType.objects.get_for_models(User, Group)
+    with django_assert_num_queries(0):
+        qs = Comment.objects.filter(owner__in=User.objects.filter(is_active=True))
+        mixed = Comment.objects.filter(
+            owner__in=[User.objects.filter(is_active=False), Group.objects.all()]
+        )
+    assert [c.owner for c in qs] == [active]
+    assert {c.owner for c in mixed} == {inactive, group}
+
+
+@pytest.mark.django_db
+def test_gfk_in_polymorphic_queryset_matches_child_content_types():
+    comment = PolyComment.objects.create()
+    reply = PolyReply.objects.create(body="re")
+    for target in (comment, reply):
+        Tag.objects.create(target=target)
+
+    # the queryset yields a PolyReply: its pair carries PolyReply's content type
+    assert set(Tag.objects.filter(target__in=PolyComment.objects.all())) == set(
+        Tag.objects.filter(target__in=list(PolyComment.objects.all()))
+    )
+    assert {t.target for t in Tag.objects.filter(target__in=PolyComment.objects.all())} == {comment, reply}
+    assert [t.target for t in Tag.objects.filter(target__in=PolyReply.objects.all())] == [reply]
+    # non_polymorphic() rows are parents, like the ones list() would give
+    assert [t.target for t in Tag.objects.filter(target__in=PolyComment.objects.non_polymorphic())] == [comment]
+
+
+def test_gfk_registry_is_precomputed_and_read_only():
+    specs = get_gfk_specs(Comment)
+    assert specs["owner"]["ct_field"] == "owner_content_type"
+    assert specs["owner"]["_source"] == "autogfk"
+    assert get_gfk_map(Comment) == {"owner": ("owner_content_type", "owner_object_id")}
+    assert get_gfk_specs(Comment) is specs
+    with pytest.raises(TypeError):
+        specs["other"] = {}
+    assert (Comment, "owner") in {(m, n) for m, n, _ in iter_gfk_specs()}
+
+@pytest.mark.django_db
+def test_prefetch_gfk_runs_one_query_per_content_type(django_assert_num_queries):
+    users = [User.objects.create_user(username=f"u{i}") for i in range(3)]
+    group = Group.objects.create(name="g")
+    for target in users + [group, None]:
+        Comment.objects.create(owner=target)
+
+    ContentType.objects.get_for_models(User, Group)
+    with django_assert_num_queries(3):
+        rows = list(Comment.objects.order_by("pk").prefetch_gfk("owner"))
+    with django_assert_num_queries(0):
+        assert [c.owner for c in rows] == users + [group, None]
+
+    # iterator() prefetches per chunk, and needs chunk_size like prefetch_related()
+    rows = list(Comment.objects.order_by("pk").prefetch_gfk("owner").iterator(chunk_size=2))
+    with django_assert_num_queries(0):
+        assert [c.owner for c in rows] == users + [group, None]
+    with pytest.raises(ValueError):
+        Comment.objects.prefetch_gfk("owner").iterator()
+
+    qs = Comment.objects.order_by("pk").prefetch_gfk(
+        "owner", querysets=[User.objects.only("username")]
+    )
+    assert qs.filter(owner__in=users).count() == 3
+    assert list(qs)[0].owner.get_deferred_fields()
+    with pytest.raises(ValueError):
+        Comment.objects.prefetch_gfk("body")
+
+
+@pytest.mark.django_db
+def test_prefetch_gfk_on_polymorphic_queryset(django_assert_num_queries):
+    user = User.objects.create_user(username="alice")
+    group = Group.objects.create(name="g")
+    PolyComment.objects.create(owner=user)
+    PolyReply.objects.create(owner=group, body="re")
+
+    ContentType.objects.get_for_models(User, Group)
+    rows = list(PolyComment.objects.order_by("pk").prefetch_gfk("owner"))
+    assert isinstance(rows[1], PolyReply)
+    with django_assert_num_queries(0):
+        assert [r.owner for r in rows] == [user, group]
+
+@pytest.mark.django_db
+def test_bulk_create_and_bulk_update_accept_logical_gfk_values(django_assert_num_queries):
+    users = [User.objects.create_user(username=f"u{i}") for i in range(3)]
+    group = Group.objects.create(name="g")
+
+    ContentType.objects.get_for_models(User, Group)
+    with django_assert_num_queries(1):
+        Comment.objects.bulk_create(
+            [{"owner": u, "body": "x"} for u in users] + [Comment(owner=group), {"owner": None}]
+        )
+    assert Comment.objects.filter(owner__in=users).count() == 3
+    assert Comment.objects.filter(owner=group).count() == 1
+
+    rows = list(Comment.objects.filter(owner__in=users).order_by("pk"))
+    for row in rows:
+        row.owner = group
+    with django_assert_num_queries(1):
+        Comment.objects.bulk_update(rows, fields=["owner"])
+    assert Comment.objects.filter(owner=group).count() == 4
+
+    # columns set explicitly win over a target cached by an earlier read
+    row = Comment.objects.get(pk=rows[0].pk)
+    assert row.owner == group
+    row.owner_content_type = ContentType.objects.get_for_model(User)
+    row.owner_object_id = users[1].pk
+    Comment.objects.bulk_update([row], fields=["owner", "body"])
+    assert Comment.objects.get(pk=row.pk).owner == users[1]
+    row.pk = None
+    Comment.objects.bulk_create([row])
+    assert Comment.objects.get(pk=row.pk).owner == users[1]
+
+    # a target saved after the assignment still gets its id
+    late = User(username="late")
+    pending = Comment()
+    pending.owner = late
+    late.save()
+    Comment.objects.bulk_create([pending])
+    assert Comment.objects.get(pk=pending.pk).owner == late
+
+@pytest.mark.django_db
+def test_gfk_lookups_into_target_fields():
+    acme = User.objects.create_user(username="acme-bot")
+    other = User.objects.create_user(username="other")
+    acme_group = Group.objects.create(name="ACME staff")
+    for target in (acme, other, acme_group):
+        Comment.objects.create(owner=target)
+
+    # "name" exists only on Group, "username" only on User
+    assert {c.owner for c in Comment.objects.filter(owner__name__icontains="acme")} == {acme_group}
+    assert {c.owner for c in Comment.objects.filter(owner__username__startswith="acme")} == {acme}
+    assert Comment.objects.filter(Q(owner__username="other") | Q(owner__name="ACME staff")).count() == 2
+    assert Comment.objects.exclude(owner__username__startswith="acme").count() == 2
+    with pytest.raises(NotImplementedError):
+        Comment.objects.filter(owner__missing="x")
+
+
+@pytest.mark.django_db
+def test_gfk_target_lookups_use_cached_content_types(django_assert_num_queries):
+    Comment.objects.filter(owner__username="x")
+    with django_assert_num_queries(0):
+        qs = Comment.objects.filter(owner__username="x")
+    assert not qs.exists()
+
+    # no limit_choices_to: refuse a subquery per installed model
+    with pytest.raises(NotImplementedError, match="limit_choices_to"):
+        Tag.objects.filter(target__name="x")
+
+@pytest.mark.django_db
+def test_gfk_content_type_lookups_and_ordering(django_assert_num_queries):
+    user = User.objects.create_user(username="alice")
+    group = Group.objects.create(name="g")
+    c_group = Comment.objects.create(owner=group)
+    c_user = Comment.objects.create(owner=user)
+    Comment.objects.create(owner=None)
+
+    user_ct, group_ct = ContentType.objects.get_for_model(User), ContentType.objects.get_for_model(Group)
+    with django_assert_num_queries(0):
+        by_class = Comment.objects.filter(owner__type=User)
+        by_label = Comment.objects.filter(owner__type="auth.Group")
+        by_in = Comment.objects.exclude(Q(owner__type__in=[user_ct, group_ct.pk]))
+    assert list(by_class) == [c_user]
+    assert list(by_label) == [c_group]
+    assert by_in.count() == 1
+
+    ordered = list(Comment.objects.filter(owner__isnull=False).order_by("owner__type"))
+    assert ordered == sorted([c_group, c_user], key=lambda c: c.owner_content_type_id)
+    assert list(Comment.objects.filter(owner__isnull=False).order_by("-owner")) == ordered[::-1]
+
+def test_pair_index_added_to_meta_indexes():
+    (index,) = [i for i in IntelligenceCredentials._meta.indexes
+                if list(i.fields) == ["owner_content_type", "owner_object_id"]]
+    assert index.name and not index.include and index.condition is None
+    # visible to makemigrations
+    assert index.name in {i.name for i in ModelState.from_model(IntelligenceCredentials).options["indexes"]}
+
+    (index,) = [i for i in Comment._meta.indexes
+                if list(i.fields) == ["owner_content_type", "owner_object_id"]]
+    assert index.include == ("body",)
+    assert index.condition == Q(owner_content_type__isnull=False)
+
+    # opt-in: fields declared without pair_index get no new index on upgrade
+    assert not [i for i in Bookmark._meta.indexes if list(i.fields) == ["target_content_type", "target_object_id"]]
+
+@pytest.mark.django_db
+def test_pair_constraint_replaces_python_check_on_save():
+    assert get_save_checked_pairs(Comment) == ()
+    assert get_save_checked_pairs(PolyComment) == (("owner_content_type", "owner_object_id"),)
+    (constraint,) = [c for c in Comment._meta.constraints if c.name.endswith("_pair")]
+    assert constraint.name.startswith("testapp_co_owner_") and len(constraint.name) <= 30
+
+    ct = ContentType.objects.get_for_model(User)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Comment.objects.bulk_create([Comment(owner_content_type=ct, owner_object_id=None)])
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Comment(owner_content_type=ct).save()
+    # models without the constraint still get partial pairs reset in Python
+    poly = PolyComment(owner_content_type=ct)
+    poly.save()
+    assert poly.owner_content_type is None
+
+@pytest.mark.django_db
+def test_uuid_object_id_end_to_end(admin_client):
+    assert isinstance(Bookmark._meta.get_field("target_object_id"), models.UUIDField)
+    doc = Document.objects.create(title="Quarterly report")
+    Bookmark.objects.create(target=doc)
+    assert Bookmark.objects.get(target__title__startswith="Quarterly").target == doc
+    assert Bookmark.objects.filter(target__in=Document.objects.all()).count() == 1
+
+    ct = ContentType.objects.get_for_model(Document)
+    field = AutoGenericForeignKeyFormField(
+        oid_to_python=Bookmark._meta.get_field("target_object_id").to_python
+    )
+    assert field.compress([ct, str(doc.pk)]) == {"content_type": ct, "object_id": doc.pk}
+
+    url = reverse("autogfk:autocomplete") + f"?ct={ct.pk}&q={doc.pk}"
+    assert [r["id"] for r in admin_client.get(url).json()["results"]] == [str(doc.pk)]
+
+@pytest.mark.django_db
+def test_autocomplete_keyset_pagination_without_count(admin_client):
+    User.objects.bulk_create([User(username=f"bulk{i:03d}") for i in range(65)])
+    ct = ContentType.objects.get_for_model(User)
+    url = reverse("autogfk:autocomplete") + f"?ct={ct.pk}&q=bulk"
+
+    seen, cursor = [], None
+    with CaptureQueriesContext(connection) as ctx:
+        while True:
+            data = admin_client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+            seen += [r["id"] for r in data["results"]]
+            cursor = data["next_cursor"]
+            assert data["more"] == bool(cursor)
+            if not cursor:
+                break
+    assert len(seen) == len(set(seen)) == 65
+    assert not any("COUNT(" in q["sql"] for q in ctx.captured_queries)
+    # legacy page numbers still work (OFFSET, no COUNT)
+    assert len(admin_client.get(url + "&page=3").json()["results"]) == 5
+
+    # relations sort by the related model's ordering: offset cursor instead
+    assert autogfk_views._keyset_ordering(FolderItem, ["folder", "pk"]) is None
+    assert autogfk_views._keyset_ordering(FolderItem, ["-pk"]) == [("id", "id", True)]
+
+@pytest.mark.django_db
+def test_autocomplete_search_config_registry(admin_client):
+    Group.objects.create(name="editors")
+    Group.objects.create(name="chief editors")
+    Group.objects.create(name="hidden editors")
+    ct = ContentType.objects.get_for_model(Group)
+    url = reverse("autogfk:autocomplete") + f"?ct={ct.pk}&q=edit"
+
+    # default: the registered GroupAdmin.search_fields ("name" -> icontains)
+    assert len(admin_client.get(url).json()["results"]) == 3
+
+    autocomplete_config.register(
+        Group,
+        search_fields=["^name"],
+        queryset=lambda request: Group.objects.exclude(name__startswith="hidden"),
+    )
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            texts = [r["text"] for r in admin_client.get(url).json()["results"]]
+        assert texts == ["editors"]
+        assert any("LIKE 'edit%'" in q["sql"] for q in ctx.captured_queries)
+    finally:
+        autocomplete_config.unregister(Group)
+
+@pytest.mark.django_db
+def test_autocomplete_label_projection(admin_client):
+    Group.objects.create(name="editors")
+    ct = ContentType.objects.get_for_model(Group)
+    url = reverse("autogfk:autocomplete") + f"?ct={ct.pk}&q=edit"
+
+    autocomplete_config.register(Group, label="{name} (#{id})")
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            results = admin_client.get(url).json()["results"]
+        assert [r["text"] for r in results] == [f"editors (#{results[0]['id']})"]
+        sql = [q["sql"] for q in ctx.captured_queries if 'FROM "auth_group"' in q["sql"]][-1]
+        assert sql.startswith('SELECT "auth_group"."id", "auth_group"."name" FROM')
+
+        autocomplete_config.register(Group, label_fields=["name"], label=lambda row: row["name"].upper())
+        assert [r["text"] for r in admin_client.get(url).json()["results"]] == ["EDITORS"]
+    finally:
+        autocomplete_config.unregister(Group)
+
+@pytest.mark.django_db
+@override_settings(
+    AUTOGFK_AUTOCOMPLETE_CACHE={"TIMEOUT": 60},
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "autogfk-tests"}},
+)
+def test_autocomplete_cache_and_invalidation(admin_client, client):
+    Group.objects.create(name="editors")
+    ct = ContentType.objects.get_for_model(Group)
+    url = reverse("autogfk:autocomplete") + f"?ct={ct.pk}&q=edit"
+    autogfk_views.reset_cache_stats()
+
+    assert len(admin_client.get(url).json()["results"]) == 1
+    with CaptureQueriesContext(connection) as ctx:
+        assert len(admin_client.get(url).json()["results"]) == 1
+    assert not any('"auth_group"' in q["sql"] for q in ctx.captured_queries)
+    assert autogfk_views.cache_stats()["hits"] == 1
+
+    # the key holds the term as searched, and each user (superusers too) has their own entries
+    admin_client.get(url.replace("edit", " EDIT "))
+    client.force_login(User.objects.create_superuser("root2", "root2@example.com", "x"))
+    client.get(url)
+    assert autogfk_views.cache_stats()["misses"] == 3
+
+    Group.objects.create(name="chief editors")  # post_save bumps the generation
+    assert len(admin_client.get(url).json()["results"]) == 2
+    stats = autogfk_views.cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 4) and stats["invalidations"] >= 1
+
+
+@pytest.mark.django_db
+def test_cache_invalidation_is_limited_to_gfk_targets():
+    from autogfk.contenttypes import gfk_target_models
+
+    # Tag's GFK has no limit_choices_to: any model may be served
+    assert gfk_target_models() is None
+    targets = frozenset({User, Group, PolyComment})
+    assert autogfk_views._invalidated_by(Folder, targets) == []
+    assert autogfk_views._invalidated_by(Group, targets) == [Group]
+    # a multi-table child changes its parent's rows too
+    assert autogfk_views._invalidated_by(PolyReply, targets) == [PolyComment]
+    assert autogfk_views._invalidated_by(PolyReply, None) == [PolyReply, PolyComment]
+
+@pytest.mark.django_db
+def test_bulk_label_resolution(admin_client):
+    from django.contrib import admin as django_admin
+
+    users = [User.objects.create_user(username=f"res{i}") for i in range(3)]
+    group = Group.objects.create(name="staff")
+    user_ct = ContentType.objects.get_for_model(User)
+    group_ct = ContentType.objects.get_for_model(Group)
+    pairs = [(user_ct.pk, u.pk) for u in users] + [(group_ct.pk, group.pk), (group_ct.pk, 999999)]
+
+    ContentType.objects.get_for_id(user_ct.pk), ContentType.objects.get_for_id(group_ct.pk)
+    with CaptureQueriesContext(connection) as ctx:
+        resolved = resolve_labels(pairs)
+    assert len(ctx.captured_queries) == 2  # one per content type
+    assert resolved[(group_ct.pk, str(group.pk))]["text"] == "staff"
+    assert resolved[(user_ct.pk, str(users[0].pk))]["change_url"].startswith(f"/admin/auth/user/{users[0].pk}/change/")
+    assert (group_ct.pk, "999999") not in resolved
+
+    # widgets primed ahead of rendering don't query again
+    widget = AutoGenericForeignKeyWidget(None, django_admin.site, limit_ct_qs=ContentType.objects.filter(pk=user_ct.pk))
+    widget.prime([(user_ct.pk, u.pk) for u in users])
+    with CaptureQueriesContext(connection) as ctx:
+        for u in users:
+            widget.get_context("owner", (user_ct.pk, u.pk), {"id": "id_owner"})
+    assert not any('"auth_user"' in q["sql"] for q in ctx.captured_queries)
+
+    url = reverse("autogfk:labels") + "?" + "&".join(f"pair={ct}:{oid}" for ct, oid in pairs)
+    results = admin_client.get(url).json()["results"]
+    assert sorted(r["text"] for r in results) == ["res0", "res1", "res2", "staff"]
+
+@pytest.mark.django_db
+def test_search_all_content_types(admin_client):
+    User.objects.create_user(username="editorial")
+    User.objects.create_user(username="the_editor")
+    Group.objects.create(name="editor")
+    user_ct = ContentType.objects.get_for_model(User)
+    group_ct = ContentType.objects.get_for_model(Group)
+
+    url = reverse("autogfk:search") + f"?cts={user_ct.pk},{group_ct.pk}&q=editor"
+    data = admin_client.get(url).json()
+    # exact match (group) first, then the prefix match ahead of the contains match
+    assert [g["text"] for g in data["results"]] == ["Groups", "Users"]
+    assert data["results"][0]["children"] == [{"id": f"{group_ct.pk}:{Group.objects.get().pk}", "text": "editor"}]
+    assert [c["text"] for c in data["results"][1]["children"]] == ["editorial", "the_editor"]
+    assert admin_client.get(reverse("autogfk:search")).status_code == 404
+
+    # ranked before the per-type slice: matches created after many "contains" hits still come first
+    User.objects.bulk_create([User(username=f"x_editor_{i:02d}") for i in range(autogfk_views.SEARCH_PER_TYPE)])
+    User.objects.create_user(username="editor")
+    (users,) = [g for g in admin_client.get(url).json()["results"] if g["text"] == "Users"]
+    children = users["children"]
+    assert [c["text"] for c in children[:2]] == ["editor", "editorial"]
+    assert len(children) == autogfk_views.SEARCH_PER_TYPE
+
+@pytest.mark.django_db
+def test_autocomplete_async_view(admin_user):
+    User.objects.bulk_create([User(username=f"async{i:02d}") for i in range(35)])
+    ct = ContentType.objects.get_for_model(User)
+    base = reverse("autogfk:autocomplete_async") + f"?ct={ct.pk}&q=async"
+
+    assert async_to_sync(AsyncClient().get)(base).status_code == 302  # staff only
+
+    client = AsyncClient()
+    client.force_login(admin_user)
+    first = async_to_sync(client.get)(base).json()
+    assert len(first["results"]) == 30 and first["more"]
+    second = async_to_sync(client.get)(base + f"&cursor={first['next_cursor']}").json()
+    assert [r["text"] for r in second["results"]] == [f"async{i:02d}" for i in range(30, 35)]
+    assert not second["more"]
+
+@pytest.mark.django_db
+def test_content_type_cache_layer(admin_client):
+    user_ct = ContentType.objects.get_for_model(User)
+    ContentType.objects.clear_cache()
+    with CaptureQueriesContext(connection) as ctx:
+        warm_up()
+        assert get_content_type(user_ct.pk) == get_content_type("auth.User") == get_content_type(User) == user_ct
+    assert len(ctx.captured_queries) == 1
+
+    # the autocomplete view no longer queries django_content_type per keystroke
+    with CaptureQueriesContext(connection) as ctx:
+        admin_client.get(reverse("autogfk:autocomplete") + f"?ct={user_ct.pk}&q=x")
+    assert not any("django_content_type" in q["sql"] for q in ctx.captured_queries)
+    assert admin_client.get(reverse("autogfk:autocomplete") + "?ct=abc").status_code == 404
+
+    # deleted rows don't linger in the cache
+    stale = ContentType.objects.create(app_label="gone", model="removed")
+    assert get_content_type(stale.pk) == stale
+    stale_pk = stale.pk
+    stale.delete()
+    with pytest.raises(ContentType.DoesNotExist):
+        get_content_type(stale_pk)
+
+    # rows without a model (another process may still cache them) resolve to no target
+    orphan = ContentType.objects.create(app_label="gone", model="orphan")
+    comment = Comment.objects.create(owner_content_type=orphan, owner_object_id=1)
+    assert Comment.objects.prefetch_gfk("owner").get(pk=comment.pk).owner is None
+    assert admin_client.get(reverse("autogfk:autocomplete") + f"?ct={orphan.pk}").json()["results"] == []
+
+@pytest.mark.django_db
+def test_widget_content_type_metadata_is_memoized_per_request(admin_user, rf):
+    from django.contrib import admin as django_admin
+
+    def widgets(request, n):
+        return [
+            AutoGenericForeignKeyWidget(
+                None, django_admin.site, request=request,
+                limit_ct_qs=ContentType.objects.filter(app_label="auth"),
+            )
+            for _ in range(n)
+        ]
+
+    request = rf.get("/")
+    request.user = admin_user
+    user_ct = ContentType.objects.get_for_model(User)
+    # nothing is computed until rendering, then once per request and limit set
+    with CaptureQueriesContext(connection) as ctx:
+        built = widgets(request, 5)
+    assert len(ctx.captured_queries) == 0
+    with CaptureQueriesContext(connection) as ctx:
+        html = "".join(w.render(f"f{i}", (user_ct.pk, None), {"id": f"id_f{i}"}) for i, w in enumerate(built))
+    assert len(ctx.captured_queries) == 1
+
+    # one json_script block per page and limit set; selects only carry the selected CT
+    meta_ids = set(re.findall(r'data-autogfk-ct-meta="([^"]+)"', html))
+    assert len(meta_ids) == 1
+    assert html.count(f'<script id="{meta_ids.pop()}" type="application/json">') == 1
+    assert html.count("<option") == 2 * len(built)
+
+    # a new request starts from scratch
+    other = rf.get("/")
+    other.user = admin_user
+    with CaptureQueriesContext(connection) as ctx:
+        widgets(other, 1)[0].render("f", None, {"id": "id_f"})
+    assert len(ctx.captured_queries) == 1
+
+@pytest.mark.django_db
+def test_small_content_types_are_preloaded(admin_client):
+    Group.objects.create(name="editors")
+    Group.objects.create(name="staff")
+    ct = ContentType.objects.get_for_model(Group)
+    url = reverse("autogfk:choices") + f"?ct={ct.pk}"
+
+    assert admin_client.get(url).json() == {"preload": False}  # off by default
+
+    with override_settings(AUTOGFK_PRELOAD_THRESHOLD=2):
+        resp = admin_client.get(url)
+        assert [r["text"] for r in resp.json()["results"]] == ["editors", "staff"]
+        assert admin_client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code == 304
+
+        Group.objects.create(name="viewers")  # above the threshold: back to AJAX search
+        assert admin_client.get(url).json() == {"preload": False}
+
+@pytest.mark.django_db
+def test_admin_form_class_is_cached(admin_user, rf):
+    from django.contrib import admin as django_admin
+    from autogfk.admin import AutoGenericForeignKeyAdminMixin, _defer_surrogates
+
+    class CommentAdmin(AutoGenericForeignKeyAdminMixin, django_admin.ModelAdmin):
+        pass
+
+    model_admin = CommentAdmin(Comment, django_admin.site)
+    alice = User.objects.create_user(username="alice")
+    bob = User.objects.create_user(username="bob")
+    first = Comment.objects.create(owner=alice, body="a")
+    second = Comment.objects.create(owner=bob, body="b")
+
+    request = rf.get("/")
+    request.user = admin_user
+    form_class = model_admin.get_form(request, first, change=True)
+    assert model_admin.get_form(request, second, change=True) is form_class
+    assert model_admin.get_form(request, None) is not form_class  # add form differs
+
+    # initial values and labels come from each instance, not from the cached class
+    other = rf.get("/")
+    other.user = admin_user
+    form = model_admin.get_form(other, second, change=True)(instance=second)
+    assert form.initial["owner__autogfk"] == (second.owner_content_type_id, bob.pk)
+    assert ">bob</option>" in str(form["owner__autogfk"])
+
+    # no change permission: Django's get_form() makes the fields readonly
+    staff = User.objects.create_user(username="staff", is_staff=True)
+    staff_request = rf.get("/")
+    staff_request.user = staff
+    assert model_admin.get_form(staff_request, first, change=True) is not form_class
+
+    # related-field wrappers and formfield_for_* hooks are built per user: no sharing
+    staff.user_permissions.add(Permission.objects.get(codename="change_comment"))
+    staff = User.objects.get(pk=staff.pk)
+    staff_request.user = staff
+    staff_class = model_admin.get_form(staff_request, first, change=True)
+    assert staff_class is not form_class
+    assert model_admin.get_form(staff_request, second, change=True) is staff_class
+    root2 = rf.get("/")
+    root2.user = User.objects.create_superuser("root2", "root2@example.com", "x")
+    assert model_admin.get_form(root2, first, change=True) is not form_class
+    # a permission change builds a new class for the same user
+    staff.user_permissions.add(Permission.objects.get(codename="view_group"))
+    staff_request.user = User.objects.get(pk=staff.pk)
+    assert model_admin.get_form(staff_request, first, change=True) is not staff_class
+
+    def ct_perms(request):
+        form = form_class(instance=first)
+        _defer_surrogates([form], ["owner__autogfk"], request=request)
+        html = str(form["owner__autogfk"])
+        meta = json.loads(re.search(r'<script id="autogfk-ct-[^"]+" type="application/json">(.*?)</script>', html).group(1))
+        return {row[2]: row[3]["add"] for row in meta["ctmap"]}
+
+    assert ct_perms(request)["user"] is True
+    assert ct_perms(staff_request)["user"] is False
+
+    # a POST that saves and redirects never resolves labels
+    with CaptureQueriesContext(connection) as ctx:
+        form = form_class({"owner__autogfk_0": first.owner_content_type_id, "owner__autogfk_1": bob.pk, "body": "c"}, instance=first)
+        assert form.is_valid(), form.errors
+    assert not any('"auth_user"' in q["sql"] for q in ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_callable_limit_choices_to_is_evaluated_per_form(admin_user, rf, monkeypatch):
+    from django.contrib import admin as django_admin
+    from autogfk.admin import AutoGenericForeignKeyAdminMixin, AutoGenericForeignKeyInlineAdminMixin
+    from tests.testapp import models as testapp_models
+
+    class NoteAdmin(AutoGenericForeignKeyAdminMixin, django_admin.ModelAdmin):
+        pass
+
+    class NoteInline(AutoGenericForeignKeyInlineAdminMixin, django_admin.TabularInline):
+        model = Note
+        extra = 1
+
+    model_admin = NoteAdmin(Note, django_admin.site)
+    inline = NoteInline(Folder, django_admin.site)
+    folder = Folder.objects.create(name="notes")
+    request = rf.get("/")
+    request.user = admin_user
+
+    def allowed(form):
+        field = form.fields["subject__autogfk"]
+        models_ = {ct.model for ct in field.fields[0].queryset}
+        assert {ct.model for ct in field.widget.limit_ct_qs} == models_
+        return models_
+
+    form_class = model_admin.get_form(request, None)
+    formset_class = inline.get_formset(request, folder)
+    assert allowed(form_class()) == {"user"}
+    assert allowed(formset_class(instance=folder).forms[0]) == {"user"}
+
+    # the cached form class and the structure see the new value on the next form
+    monkeypatch.setattr(testapp_models, "NOTE_TARGET_MODELS", ["group"])
+    assert model_admin.get_form(request, None) is form_class
+    assert allowed(form_class()) == {"group"}
+    formset = inline.get_formset(request, folder)(instance=folder)
+    assert allowed(formset.forms[0]) == allowed(formset.empty_form) == {"group"}
+    def post(target):
+        ct = ContentType.objects.get_for_model(target)
+        return form_class({"folder": folder.pk, "subject__autogfk_0": ct.pk, "subject__autogfk_1": target.pk})
+
+    assert post(Group.objects.create(name="g")).is_valid()
+    assert "subject__autogfk" in post(admin_user).errors
+
+
+def test_inline_formset_renders_in_constant_queries(admin_user, rf):
+    from django.contrib import admin as django_admin
+    from autogfk.admin import AutoGenericForeignKeyInlineAdminMixin
+
+    class FolderItemInline(AutoGenericForeignKeyInlineAdminMixin, django_admin.TabularInline):
+        model = FolderItem
+        extra = 1
+
+    inline = FolderItemInline(Folder, django_admin.site)
+    users = [User.objects.create_user(username=f"user{i}") for i in range(50)]
+    group = Group.objects.create(name="staff")
+
+    def render(rows):
+        folder = Folder.objects.create(name=f"{rows} rows")
+        FolderItem.objects.bulk_create(
+            FolderItem(folder=folder, item=users[i], source=group) for i in range(rows)
+        )
+        request = rf.get("/")
+        request.user = admin_user
+        with CaptureQueriesContext(connection) as ctx:
+            formset = inline.get_formset(request, folder)(instance=folder, queryset=folder.items.all())
+            html = "".join(str(form[name]) for form in formset.forms for name in ("item__autogfk", "source__autogfk"))
+        assert html.count(">staff</option>") == rows
+        assert ">user0</option>" in html and (rows < 50 or ">user49</option>" in html)
+        return len(ctx.captured_queries)
+
+    render(1)  # content types and the per-GFK structure are loaded once
+    assert render(5) == render(50)
@@ -1,6 +1,8 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
 from autogfk.fields import AutoGenericForeignKey
+from autogfk.models import AutoGenericForeignKeyModel, AutoGenericForeignKeyPolymorphicModel
 
 OWNER_LIMIT_CHOICES_TO = {"app_label__in": ["auth"]}
 
@@ -11,5 +13,90 @@ class IntelligenceCredentials(models.Model):
         limit_choices_to=OWNER_LIMIT_CHOICES_TO,
         related_name="intelligence_credentials",
         label="Dono",
+        pair_index=True,
     )
     label = models.CharField(max_length=50, default="cred")
+
+
+class Comment(AutoGenericForeignKeyModel):
+    owner = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to=OWNER_LIMIT_CHOICES_TO,
+        related_name="comments",
+        pair_index=True,
+        pair_index_include=["body"],
+        pair_index_partial=True,
+        pair_constraint=True,
+    )
+    body = models.CharField(max_length=50, default="")
+
+
+class PolyComment(AutoGenericForeignKeyPolymorphicModel):
+    owner = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to=OWNER_LIMIT_CHOICES_TO,
+        related_name="poly_comments",
+    )
+
+
+class PolyReply(PolyComment):
+    body = models.CharField(max_length=50, default="")
+
+
+class Document(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    title = models.CharField(max_length=50)
+
+
+class Bookmark(AutoGenericForeignKeyModel):
+    target = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to={"app_label": "testapp", "model": "document"},
+        related_name="bookmarks",
+        oid_type="uuid",
+    )
+
+
+class Folder(models.Model):
+    name = models.CharField(max_length=50)
+
+
+class FolderItem(AutoGenericForeignKeyModel):
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="items")
+    item = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to=OWNER_LIMIT_CHOICES_TO,
+        related_name="folder_items",
+    )
+    source = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to=OWNER_LIMIT_CHOICES_TO,
+        related_name="sourced_folder_items",
+    )
+
+
+class Tag(AutoGenericForeignKeyModel):
+    target = AutoGenericForeignKey(null=True, blank=True, related_name="tags")
+
+
+# switched by the tests: a callable limit_choices_to is evaluated for every form
+NOTE_TARGET_MODELS = ["user"]
+
+
+def note_limit_choices_to():
+    return {"app_label": "auth", "model__in": list(NOTE_TARGET_MODELS)}
+
+
+class Note(AutoGenericForeignKeyModel):
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, related_name="notes")
+    subject = AutoGenericForeignKey(
+        null=True,
+        blank=True,
+        limit_choices_to=note_limit_choices_to,
+        related_name="notes",
+    )